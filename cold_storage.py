@@ -0,0 +1,126 @@
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+# Flat Parquet column -> dotted path in a measurements document
+ARCHIVE_FIELDS = {
+    'timestamp': 'timestamp',
+    'serial': 'metadata.serial',
+    'obis': 'metadata.obis',
+    'avg_import_kw': 'avg_import_kw',
+    'import_kwh': 'import_kwh',
+    'avg_export_kw': 'avg_export_kw',
+    'export_kwh': 'export_kwh',
+    'avg_import_kva': 'avg_import_kva',
+    'avg_export_kva': 'avg_export_kva',
+    'import_kvarh': 'import_kvarh',
+    'export_kvarh': 'export_kvarh',
+    'power_factor': 'power_factor',
+    'avg_current': 'avg_current',
+    'avg_voltage': 'avg_voltage',
+    'phase_a_current': 'phases.A.instCurrent',
+    'phase_a_voltage': 'phases.A.instVoltage',
+    'phase_a_power_factor': 'phases.A.instPowerFactor',
+    'phase_b_current': 'phases.B.instCurrent',
+    'phase_b_voltage': 'phases.B.instVoltage',
+    'phase_c_current': 'phases.C.instCurrent',
+    'phase_c_voltage': 'phases.C.instVoltage',
+}
+
+def month_start(ts):
+    return datetime(ts.year, ts.month, 1)
+
+def next_month(ts):
+    return datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+
+def flatten_measurements(docs):
+    """Turn measurements documents into a DataFrame with the flat ARCHIVE_FIELDS columns."""
+    df = pd.json_normalize(docs)
+    flat = pd.DataFrame({column: df[path] if path in df.columns else pd.Series(float('nan'), index=df.index)
+                         for column, path in ARCHIVE_FIELDS.items()})
+    flat['timestamp'] = pd.to_datetime(flat['timestamp'])
+    flat['serial'] = flat['serial'].astype('int64')
+    flat['obis'] = flat['obis'].astype('string')
+    return flat
+
+class ColdStorage:
+    """Partitioned, compressed Parquet archive of raw measurements.
+
+    Layout: ``<root>/serial=<serial>/month=<YYYY-MM>/data.parquet``. ``root`` is a
+    local directory or any URI pyarrow understands (e.g. ``s3://bucket/prefix``;
+    S3 credentials come from the usual AWS environment variables).
+    """
+
+    def __init__(self, root_uri, logger, compression='zstd'):
+        if '://' not in root_uri:
+            root_uri = os.path.abspath(root_uri)
+        self.fs, self.root = pafs.FileSystem.from_uri(root_uri)
+        self.logger = logger
+        self.compression = compression
+
+    def _serial_dir(self, serial):
+        return f"{self.root}/serial={serial}"
+
+    def partition_path(self, serial, month):
+        return f"{self._serial_dir(serial)}/month={month:%Y-%m}/data.parquet"
+
+    def list_months(self, serial):
+        selector = pafs.FileSelector(self._serial_dir(serial), allow_not_found=True)
+        months = []
+        for info in self.fs.get_file_info(selector):
+            name = info.base_name
+            if info.type == pafs.FileType.Directory and name.startswith('month='):
+                months.append(datetime.strptime(name[len('month='):], '%Y-%m'))
+        return sorted(months)
+
+    def write_partition(self, serial, month, df):
+        """Write (or merge into) one serial/month partition; returns the partition's row count.
+
+        Merging keeps archiving idempotent: readings archived twice, e.g. after a
+        crash between writing and deleting from MongoDB, are stored once.
+        """
+        path = self.partition_path(serial, month)
+        if self.fs.get_file_info(path).type == pafs.FileType.File:
+            existing = pq.read_table(path, filesystem=self.fs).to_pandas()
+            df = pd.concat([existing, df], ignore_index=True)
+        df = df.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp')
+        table = pa.Table.from_pandas(df[list(ARCHIVE_FIELDS)], preserve_index=False)
+
+        self.fs.create_dir(path.rsplit('/', 1)[0], recursive=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(table, tmp_path, filesystem=self.fs, compression=self.compression)
+        self.fs.move(tmp_path, path)
+        return table.num_rows
+
+    def read(self, serials, start=None, end=None, columns=None):
+        """Read archived readings for ``serials`` in ``[start, end)``, pruning by month partition."""
+        columns = list(columns or ARCHIVE_FIELDS)
+        if 'serial' not in columns:
+            columns.append('serial')
+        filters = []
+        if start is not None:
+            filters.append(('timestamp', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('timestamp', '<', pd.Timestamp(end)))
+
+        frames = []
+        for serial in serials:
+            for month in self.list_months(serial):
+                if start is not None and next_month(month) <= pd.Timestamp(start):
+                    continue
+                if end is not None and month >= pd.Timestamp(end):
+                    continue
+                table = pq.read_table(self.partition_path(serial, month), filesystem=self.fs,
+                                      columns=columns, filters=filters or None)
+                if table.num_rows:
+                    frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True)
+        self.logger.info(f"Read {len(df)} archived readings from {len(frames)} partitions")
+        return df
@@ -11,6 +11,23 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', None)
 }
 
+# Shared MongoClient settings (see mongo_connection.py)
+MONGO_CONFIG = {
+    'max_pool_size': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+    'min_pool_size': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+    'wait_queue_timeout_ms': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 120000)),
+    # Offered in order; the server picks the first it supports
+    'compressors': os.getenv('MONGO_COMPRESSORS', 'zstd,snappy,zlib'),
+    'zlib_compression_level': int(os.getenv('MONGO_ZLIB_COMPRESSION_LEVEL', 6)),
+    'app_name': os.getenv('MONGO_APP_NAME', 'load-profiles'),
+    # Training reads of measurements; -1 disables the staleness bound (otherwise >= 90).
+    # Secondary reads are opt-in: with PREDICTION_SCHEDULE=changed a lagging secondary
+    # can hide the readings that flagged a customer, so its flag is cleared untrained.
+    'analytics_read_preference': os.getenv('MONGO_ANALYTICS_READ_PREFERENCE', 'primary'),
+    'analytics_read_concern': os.getenv('MONGO_ANALYTICS_READ_CONCERN', 'local'),
+    'analytics_max_staleness_seconds': int(os.getenv('MONGO_ANALYTICS_MAX_STALENESS_SECONDS', -1))
+}
+
 S3_CONFIG = {
     'aws_access_key_id': os.getenv('AWS_ACCESS_KEY_ID'),
     'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY'),
@@ -25,4 +42,55 @@ REQUIRED_ENV_VARS = {
     'S3': ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_REGION', 'S3_BUCKET_NAME']
 }
 
-OUTPUT_BASE_DIR = "customer_outputs_bilstm_day"
\ No newline at end of file
+OUTPUT_BASE_DIR = "customer_outputs_bilstm_day"
+
+# Training profile for prediction/model_training.py ('default' or 'fast')
+TRAINING_PROFILE = os.getenv('TRAINING_PROFILE', 'default')
+
+# Training-window sampling per epoch: 'all', 'cap', 'recency' or 'stride'
+TRAINING_SAMPLING = {
+    'strategy': os.getenv('TRAINING_SAMPLING', 'all'),
+    'max_windows': int(os.getenv('TRAINING_MAX_WINDOWS', 20000)),
+    'half_life_days': float(os.getenv('TRAINING_RECENCY_HALF_LIFE_DAYS', 90)),
+    'stride': int(os.getenv('TRAINING_WINDOW_STRIDE', 4))
+}
+
+# Which customers a prediction run visits: 'full' (every customer) or
+# 'changed' (only customers flagged in dirty_customers by data ingestion)
+PREDICTION_SCHEDULE = os.getenv('PREDICTION_SCHEDULE', 'full')
+# Customers that fail stay flagged but are retried with exponential backoff:
+# DIRTY_RETRY_BASE_MINUTES after the first failure, doubling up to DIRTY_RETRY_MAX_HOURS
+DIRTY_RETRY_BASE_MINUTES = int(os.getenv('DIRTY_RETRY_BASE_MINUTES', 30))
+DIRTY_RETRY_MAX_HOURS = int(os.getenv('DIRTY_RETRY_MAX_HOURS', 24))
+
+# 'local' runs every queued customer in this process; 'leases' splits the run
+# across any number of workers through the work_leases collection. Workers
+# sharing a PREDICTION_RUN_ID cooperate on the same run; with 'leases' the
+# launcher must set it (e.g. to the scheduler's job id) so that workers starting
+# at different times still join the same run.
+PREDICTION_COORDINATION = os.getenv('PREDICTION_COORDINATION', 'local')
+PREDICTION_RUN_ID = os.getenv('PREDICTION_RUN_ID', '')
+WORK_LEASE_SECONDS = int(os.getenv('WORK_LEASE_SECONDS', 900))
+
+# Prediction plots: 'sync' (inline), 'deferred' (background process pool),
+# 'lazy' (render on demand with prediction/plotting.py) or 'off'
+PLOT_MODE = os.getenv('PLOT_MODE', 'sync')
+
+# Prediction storage: 'rows' (customer_prediction, one document per interval)
+# or 'compact' (customer_forecast, one document per customer with 96-element arrays)
+PREDICTION_LAYOUT = os.getenv('PREDICTION_LAYOUT', 'rows')
+PREDICTION_FLUSH_SIZE = int(os.getenv('PREDICTION_FLUSH_SIZE', 100))
+
+# Cold storage for old raw measurements: a local directory or s3://bucket/prefix.
+# Leave empty to keep all measurements in MongoDB.
+COLD_STORAGE_URI = os.getenv('COLD_STORAGE_URI', '')
+ARCHIVE_HORIZON_DAYS = int(os.getenv('ARCHIVE_HORIZON_DAYS', 365))
+
+# How measurement reads are decoded into columns: 'arrow' (needs pymongoarrow),
+# 'raw' (raw BSON batches), 'cursor', or 'auto' to pick the fastest available
+MEASUREMENT_DECODER = os.getenv('MEASUREMENT_DECODER', 'auto')
+
+# 'local' assumes a single ingestion runner; 'leases' lets several data_load
+# workers split the S3 listing through per-file claims in file_claims
+INGESTION_COORDINATION = os.getenv('INGESTION_COORDINATION', 'local')
+FILE_LEASE_SECONDS = int(os.getenv('FILE_LEASE_SECONDS', 600))
@@ -33,6 +33,22 @@ db.createCollection("meters");
 print("⚙️ Creating collection: processed_files");
 db.createCollection("processed_files");
 
+// Customers with measurements not yet seen by the prediction run
+print("⚙️ Creating collection: dirty_customers");
+db.createCollection("dirty_customers");
+
+// Per-file claims used when several ingestion workers share the bucket
+print("⚙️ Creating collection: file_claims");
+db.createCollection("file_claims");
+
+// Compact prediction layout: one document per customer forecast
+print("⚙️ Creating collection: customer_forecast");
+db.createCollection("customer_forecast");
+
+// Leases used to split prediction runs across workers
+print("⚙️ Creating collection: work_leases");
+db.createCollection("work_leases");
+
 // =============================================================
 // 2. Create Indexes
 // =============================================================
@@ -55,4 +71,17 @@ db.measurements.createIndex({ "metadata.serial": 1, "timestamp": -1 });
 // Processed Files
 db.processed_files.createIndex({ "fileName": 1 }, { unique: true });
 
+// Dirty Customers
+db.dirty_customers.createIndex({ "firstDirtyAt": 1 });
+
+// Customer Prediction (one row per customer and interval, target of the bulk ReplaceOne upserts)
+db.customer_prediction.createIndex({ "customer_ref": 1, "prediction_timestamp": -1 }, { unique: true });
+
+// Customer Forecast
+db.customer_forecast.createIndex({ "customer_ref": 1 }, { unique: true });
+
+// Work Leases
+db.work_leases.createIndex({ "group": 1, "status": 1, "priority": 1 });
+db.work_leases.createIndex({ "group": 1, "status": 1, "leaseExpiresAt": 1 });
+
 print("✅ All indexes created");
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logger import setup_logger
+from config import DB_CONFIG, COLD_STORAGE_URI, ARCHIVE_HORIZON_DAYS
+from database import Database
+from cold_storage import ColdStorage, flatten_measurements, month_start, next_month
+
+logger = setup_logger()
+
+class MeasurementArchiver:
+    """Moves raw measurements older than the horizon from MongoDB into ColdStorage.
+
+    Only whole calendar months that end before the horizon are archived, one
+    serial/month partition at a time: the partition is written and verified
+    before the same readings, by _id, are deleted from the measurements
+    collection, so readings uploaded meanwhile are never deleted unarchived.
+    Deleting by timestamp range from a time-series collection needs MongoDB 7.0+.
+    """
+
+    def __init__(self, db, cold_storage, logger):
+        self.db = db
+        self.cold_storage = cold_storage
+        self.logger = logger
+
+    def archive_partition(self, serial, month):
+        query = {
+            'metadata.serial': serial,
+            'timestamp': {'$gte': month, '$lt': next_month(month)}
+        }
+        docs = list(self.db.db['measurements'].find(query))
+        if not docs:
+            return 0
+        rows = self.cold_storage.write_partition(serial, month, flatten_measurements(docs))
+        if rows < len(docs):
+            raise RuntimeError(f"Archive partition {serial}/{month:%Y-%m} holds {rows} rows, expected at least {len(docs)}")
+        # Delete only the readings just archived; late uploads for the month stay for the next run
+        archived_ids = [doc['_id'] for doc in docs]
+        deleted = self.db.db['measurements'].delete_many({'_id': {'$in': archived_ids}}).deleted_count
+        if deleted != len(docs):
+            self.logger.warning(f"Deleted {deleted} of {len(docs)} archived readings for serial {serial} "
+                                f"{month:%Y-%m}; the rest were already gone")
+        self.logger.info(f"Archived {len(docs)} readings for serial {serial} {month:%Y-%m} (deleted {deleted})")
+        return len(docs)
+
+    def archive(self, horizon_days):
+        cutoff = month_start(datetime.now() - timedelta(days=horizon_days))
+        self.logger.info(f"Archiving measurements before {cutoff:%Y-%m-%d}")
+        total = 0
+        try:
+            for serial in self.db.db['measurements'].distinct('metadata.serial', {'timestamp': {'$lt': cutoff}}):
+                oldest = self.db.db['measurements'].find_one(
+                    {'metadata.serial': serial, 'timestamp': {'$lt': cutoff}},
+                    {'timestamp': 1},
+                    sort=[('timestamp', 1)]
+                )
+                if not oldest:
+                    continue
+                month = month_start(oldest['timestamp'])
+                while month < cutoff:
+                    total += self.archive_partition(serial, month)
+                    month = next_month(month)
+        except Exception as e:
+            self.logger.error(f"Archiving failed: {e}")
+            raise
+        self.logger.info(f"Archived {total} readings in total")
+        return total
+
+def main():
+    if not COLD_STORAGE_URI:
+        logger.error("Missing required environment variable: COLD_STORAGE_URI")
+        raise EnvironmentError("Missing required environment variable: COLD_STORAGE_URI")
+
+    db = Database(DB_CONFIG, logger)
+    db.connect()
+    try:
+        archiver = MeasurementArchiver(db, ColdStorage(COLD_STORAGE_URI, logger), logger)
+        archiver.archive(ARCHIVE_HORIZON_DAYS)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
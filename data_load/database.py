@@ -1,17 +1,19 @@
-import pymongo
 from pymongo.errors import ConfigurationError, OperationFailure
 
+from mongo_connection import MongoMetrics, create_client, get_database
+
 class Database:
     def __init__(self, db_config, logger):
         self.db_config = db_config
         self.logger = logger
         self.client = None
         self.db = None
+        self.metrics = MongoMetrics()
 
     def connect(self):
         try:
-            self.client = pymongo.MongoClient(self.db_config['host'], self.db_config['port'])
-            self.db = self.client[self.db_config['database']]
+            self.client = create_client(self.db_config, metrics=self.metrics)
+            self.db = get_database(self.client, self.db_config)
             # Test connection
             self.client.admin.command('ping')
             self.logger.info("Successfully connected to MongoDB database")
@@ -21,6 +23,7 @@ class Database:
 
     def close(self):
         if self.client:
+            self.metrics.log_summary(self.logger)
             self.client.close()
             self.logger.info("MongoDB connection closed")
 
@@ -46,4 +49,13 @@ class Database:
             return self.db[collection].find_one(query)
         except OperationFailure as e:
             self.logger.error(f"Find failed: {e}")
+            raise
+
+    def bulk_write(self, collection, operations):
+        try:
+            if not operations:
+                return None
+            return self.db[collection].bulk_write(operations, ordered=False)
+        except OperationFailure as e:
+            self.logger.error(f"Bulk write failed: {e}")
             raise
\ No newline at end of file
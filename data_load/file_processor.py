@@ -1,14 +1,17 @@
 import pandas as pd
 import os
-from pymongo.errors import OperationFailure
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from datetime import datetime
 
 class FileProcessor:
-    def __init__(self, db, s3_client, temp_dir, logger):
+    def __init__(self, db, s3_client, temp_dir, logger, claims=None):
         self.db = db
         self.s3_client = s3_client
         self.temp_dir = temp_dir
         self.logger = logger
+        # Optional LeaseManager over file_claims, for running several ingestion workers
+        self.claims = claims
 
     def read_data(self, file_path):
         try:
@@ -43,6 +46,8 @@ class FileProcessor:
             }
             self.db.insert_one('processed_files', document)
             self.logger.info(f"Marked file as processed: {s3_key}")
+        except DuplicateKeyError:
+            self.logger.warning(f"File already marked as processed by another worker: {s3_key}")
         except Exception as e:
             self.logger.error(f"Failed to mark file as processed: {e}")
             raise
@@ -237,11 +242,49 @@ class FileProcessor:
                     raise
 
             self.logger.info(f"Successfully inserted {total_inserted} measurements")
+            self.mark_customers_dirty(df, new_measurements)
 
         except Exception as e:
             self.logger.error(f"Failed to insert measurements: {e}")
             raise
 
+    def mark_customers_dirty(self, df, new_measurements):
+        """Record customers whose meters received new readings so the prediction
+        run only has to revisit them (see dirty_customers in create.js)."""
+        serial_to_customer = {
+            int(row['SERIAL']): int(row['CUSTOMER_REF'])
+            for _, row in df[['SERIAL', 'CUSTOMER_REF']].drop_duplicates().dropna().iterrows()
+        }
+        changes = {}
+        for doc in new_measurements:
+            customer_ref = serial_to_customer.get(int(doc['metadata']['serial']))
+            if customer_ref is None:
+                continue
+            count, latest, serials = changes.get(customer_ref, (0, doc['timestamp'], set()))
+            serials.add(int(doc['metadata']['serial']))
+            changes[customer_ref] = (count + 1, max(latest, doc['timestamp']), serials)
+
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {'_id': customer_ref},
+                {
+                    '$setOnInsert': {'firstDirtyAt': now},
+                    '$set': {'updatedAt': now},
+                    '$max': {'latestTimestamp': latest},
+                    '$inc': {'newMeasurements': count, 'version': 1},
+                    '$addToSet': {'serials': {'$each': sorted(serials)}}
+                },
+                upsert=True
+            ) for customer_ref, (count, latest, serials) in changes.items()
+        ]
+        try:
+            self.db.bulk_write('dirty_customers', operations)
+            self.logger.info(f"Marked {len(operations)} customers as having new measurements")
+        except Exception as e:
+            self.logger.error(f"Failed to mark customers dirty: {e}")
+            raise
+
     def download_file(self, s3_key):
         try:
             return self.s3_client.download_file(s3_key, self.temp_dir)
@@ -249,23 +292,46 @@ class FileProcessor:
             self.logger.error(f"Failed to download file {s3_key}: {e}")
             raise
 
+    def claim_file(self, s3_key):
+        if self.claims is None:
+            return True
+        if not self.claims.try_acquire(os.path.basename(s3_key), {'s3Path': s3_key}):
+            self.logger.info(f"Skipping file claimed by another worker: {s3_key}")
+            return False
+        # Another worker may have finished it between our check and the claim
+        if self.is_file_processed(s3_key):
+            self.claims.complete(os.path.basename(s3_key))
+            self.logger.info(f"Skipping already processed file: {s3_key}")
+            return False
+        return True
+
     def process_file(self, s3_key):
         local_path = None
+        claimed = False
         try:
             if self.is_file_processed(s3_key):
                 self.logger.info(f"Skipping already processed file: {s3_key}")
                 return
+            if not self.claim_file(s3_key):
+                return
+            claimed = self.claims is not None
             local_path = self.download_file(s3_key)
             df = self.read_data(local_path)
             self.insert_customers(df)
             self.insert_meters(df)
             self.insert_measurements(df)
             self.mark_file_processed(s3_key)
+            if claimed:
+                self.claims.complete(os.path.basename(s3_key))
+                claimed = False
             self.logger.info(f"Successfully processed file: {s3_key}")
         except Exception as e:
             self.logger.error(f"Failed to process file {s3_key}: {e}")
             raise
         finally:
+            if claimed:
+                # Hand the file back so another worker (or a rerun) can retry it
+                self.claims.release(os.path.basename(s3_key))
             if local_path and os.path.exists(local_path):
                 os.remove(local_path)
                 self.logger.info(f"Removed temporary file: {local_path}")
\ No newline at end of file
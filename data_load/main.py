@@ -5,7 +5,9 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from logger import setup_logger
-from config import S3_CONFIG, S3_BUCKET_NAME, S3_BUCKET_PREFIX, REQUIRED_ENV_VARS
+from config import (DB_CONFIG, S3_CONFIG, S3_BUCKET_NAME, S3_BUCKET_PREFIX, REQUIRED_ENV_VARS,
+                    INGESTION_COORDINATION, FILE_LEASE_SECONDS)
+from leases import LeaseManager
 from database import Database
 from s3_client import S3Client
 from file_processor import FileProcessor
@@ -24,20 +26,21 @@ def main():
     temp_dir = tempfile.mkdtemp()
     logger.info(f"Created temporary directory: {temp_dir}")
 
-    # MongoDB configuration for localhost with load_profiles_db
-    mongo_config = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'port': int(os.getenv('DB_PORT', 27017)),
-        'database': os.getenv('DB_NAME', 'load_profiles_db')
-    }
-
-    db = Database(mongo_config, logger)
+    db = Database(DB_CONFIG, logger)
     db.connect()
 
     s3 = S3Client(S3_CONFIG, S3_BUCKET_NAME, S3_BUCKET_PREFIX, logger)
     s3.connect()
 
-    processor = FileProcessor(db, s3, temp_dir, logger)
+    claims = None
+    if INGESTION_COORDINATION == 'leases':
+        claims = LeaseManager(db.db['file_claims'], logger, lease_seconds=FILE_LEASE_SECONDS)
+        claims.start_heartbeat()
+        logger.info(f"Ingestion worker {claims.owner} claiming files through file_claims")
+    elif INGESTION_COORDINATION != 'local':
+        raise ValueError(f"Unknown ingestion coordination mode: {INGESTION_COORDINATION}")
+
+    processor = FileProcessor(db, s3, temp_dir, logger, claims=claims)
 
     try:
         files = s3.list_files()
@@ -53,6 +56,8 @@ def main():
         logger.error(f"Pipeline failed: {e}")
         raise
     finally:
+        if claims is not None:
+            claims.stop_heartbeat()
         db.close()
         for root, _, files in os.walk(temp_dir):
             for file in files:
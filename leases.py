@@ -0,0 +1,217 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaseManager:
+    """Time-limited ownership of work items stored in a MongoDB collection.
+
+    Each item is a document with a ``status`` of ``pending``, ``leased`` or a
+    terminal state (``done``/``failed``). Claims are single atomic updates, so
+    any number of workers on any number of hosts can share one collection. A
+    background heartbeat extends the leases this worker holds; if the worker
+    dies, its leases expire and another worker reclaims the items. Lease
+    durations should be much larger than the clock skew between hosts.
+    """
+
+    def __init__(self, collection, logger, owner=None, lease_seconds=300, heartbeat_seconds=None):
+        self.collection = collection
+        self.logger = logger
+        self.owner = owner or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or max(lease_seconds / 3, 1)
+        self.held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    def _expiry(self):
+        return self._now() + timedelta(seconds=self.lease_seconds)
+
+    def _hold(self, item_id):
+        with self._lock:
+            self.held.add(item_id)
+
+    def _drop(self, item_id):
+        with self._lock:
+            self.held.discard(item_id)
+
+    def seed(self, group, items, reset_on_change=None):
+        """Insert pending items for ``group`` unless they already exist.
+
+        ``items`` is an iterable of ``(key, priority, extra_fields)``; seeding is
+        idempotent, so every worker of a run may call it. If ``reset_on_change``
+        names one of the extra fields, finished items whose stored value differs
+        from the seeded one go back to pending, so a reused group picks up work
+        that changed after it was done.
+        """
+        items = list(items)
+        operations = [
+            UpdateOne(
+                {'_id': f"{group}:{key}"},
+                {'$setOnInsert': {
+                    'group': group,
+                    'key': key,
+                    'priority': priority,
+                    'status': 'pending',
+                    'owner': None,
+                    'leaseExpiresAt': None,
+                    'attempts': 0,
+                    'createdAt': self._now(),
+                    **extra
+                }},
+                upsert=True
+            ) for key, priority, extra in items
+        ]
+        if reset_on_change:
+            operations += [
+                UpdateOne(
+                    {'_id': f"{group}:{key}", 'status': {'$in': ['done', 'failed']},
+                     reset_on_change: {'$ne': extra[reset_on_change]}},
+                    {'$set': {'status': 'pending', 'owner': None, 'leaseExpiresAt': None,
+                              reset_on_change: extra[reset_on_change]}}
+                ) for key, _, extra in items if extra.get(reset_on_change) is not None
+            ]
+        if not operations:
+            return
+        result = None
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Concurrent upserts of the same _id from other workers are expected
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                self.logger.error(f"Failed to seed work items for {group}: {e.details}")
+                raise
+        reset = f", reset {result.modified_count} changed items" if result and result.modified_count else ""
+        self.logger.info(f"Seeded {len(items)} work items for {group}{reset}")
+
+    def claim_next(self, group):
+        """Atomically lease the highest-priority pending or expired item of ``group``."""
+        now = self._now()
+        try:
+            doc = self.collection.find_one_and_update(
+                {
+                    'group': group,
+                    '$or': [
+                        {'status': 'pending'},
+                        {'status': 'leased', 'leaseExpiresAt': {'$lt': now}}
+                    ]
+                },
+                {
+                    '$set': {'status': 'leased', 'owner': self.owner, 'leaseExpiresAt': self._expiry(),
+                             'claimedAt': now},
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('priority', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except PyMongoError as e:
+            self.logger.error(f"Failed to claim work item for {group}: {e}")
+            raise
+        if doc is not None:
+            self._hold(doc['_id'])
+            if doc['attempts'] > 1:
+                self.logger.warning(f"Reclaimed expired lease {doc['_id']} (attempt {doc['attempts']})")
+        return doc
+
+    def try_acquire(self, item_id, fields=None):
+        """Lease a single item by id, creating it if it does not exist yet.
+
+        Returns False if another worker holds a live lease or the item already
+        reached a terminal state.
+        """
+        now = self._now()
+        try:
+            # No match on an existing item turns the upsert into a duplicate-key insert
+            self.collection.update_one(
+                {
+                    '_id': item_id,
+                    '$or': [
+                        {'status': 'pending'},
+                        {'status': 'leased', 'leaseExpiresAt': {'$lt': now}}
+                    ]
+                },
+                {
+                    '$set': {'status': 'leased', 'owner': self.owner, 'leaseExpiresAt': self._expiry(),
+                             'claimedAt': now, **(fields or {})},
+                    '$inc': {'attempts': 1}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            self.logger.error(f"Failed to acquire lease {item_id}: {e}")
+            raise
+        self._hold(item_id)
+        return True
+
+    def renew(self, item_id):
+        result = self.collection.update_one(
+            {'_id': item_id, 'owner': self.owner, 'status': 'leased'},
+            {'$set': {'leaseExpiresAt': self._expiry()}}
+        )
+        if result.matched_count == 0:
+            self._drop(item_id)
+            self.logger.warning(f"Lost lease {item_id}; another worker may have reclaimed it")
+            return False
+        return True
+
+    def complete(self, item_id, status='done', fields=None):
+        """Move a held item to a terminal state. Returns False if the lease was lost."""
+        try:
+            result = self.collection.update_one(
+                {'_id': item_id, 'owner': self.owner, 'status': 'leased'},
+                {'$set': {'status': status, 'leaseExpiresAt': None, 'completedAt': self._now(), **(fields or {})}}
+            )
+        finally:
+            self._drop(item_id)
+        if result.matched_count == 0:
+            self.logger.warning(f"Could not complete {item_id}: lease no longer held by {self.owner}")
+            return False
+        return True
+
+    def release(self, item_id):
+        """Give a held item back without completing it, e.g. on a recoverable error."""
+        try:
+            self.collection.update_one(
+                {'_id': item_id, 'owner': self.owner, 'status': 'leased'},
+                {'$set': {'status': 'pending', 'owner': None, 'leaseExpiresAt': None}}
+            )
+        finally:
+            self._drop(item_id)
+
+    def remaining(self, group):
+        return self.collection.count_documents({'group': group, 'status': {'$in': ['pending', 'leased']}})
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                held = list(self.held)
+            for item_id in held:
+                try:
+                    self.renew(item_id)
+                except PyMongoError as e:
+                    self.logger.error(f"Heartbeat failed for {item_id}: {e}")
+
+    def start_heartbeat(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._heartbeat_loop, name=f"lease-heartbeat-{self.owner}",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop_heartbeat(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
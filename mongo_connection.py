@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import defaultdict
+
+import pymongo
+from pymongo import monitoring
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (Nearest, Primary, PrimaryPreferred, Secondary,
+                                      SecondaryPreferred)
+
+from config import MONGO_CONFIG
+
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """Per-command operation latency, as reported by the driver."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.total_ms = defaultdict(float)
+        self.max_ms = defaultdict(float)
+
+    def _record(self, event, failed):
+        ms = event.duration_micros / 1000
+        with self._lock:
+            self.counts[event.command_name] += 1
+            self.total_ms[event.command_name] += ms
+            self.max_ms[event.command_name] = max(self.max_ms[event.command_name], ms)
+            if failed:
+                self.failures[event.command_name] += 1
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Time threads spend waiting to check a connection out of the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.connections_created = 0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _finish_checkout(self, failed):
+        started = getattr(self._local, 'started', None)
+        if started is None:
+            return
+        self._local.started = None
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if failed:
+                self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self._finish_checkout(failed=False)
+
+    def connection_check_out_failed(self, event):
+        self._finish_checkout(failed=True)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+class MongoMetrics:
+    """Operation latency and pool-wait metrics for one MongoClient."""
+
+    def __init__(self):
+        self.commands = CommandLatencyListener()
+        self.pool = PoolWaitListener()
+
+    @property
+    def listeners(self):
+        return [self.commands, self.pool]
+
+    def reset(self):
+        self.commands.reset()
+        self.pool.reset()
+
+    def summary(self):
+        commands = {
+            name: {
+                'count': count,
+                'failures': self.commands.failures[name],
+                'mean_ms': self.commands.total_ms[name] / count,
+                'max_ms': self.commands.max_ms[name],
+            } for name, count in self.commands.counts.items()
+        }
+        pool = {
+            'checkouts': self.pool.checkouts,
+            'checkout_failures': self.pool.checkout_failures,
+            'connections_created': self.pool.connections_created,
+            'mean_wait_ms': self.pool.total_wait_ms / self.pool.checkouts if self.pool.checkouts else 0.0,
+            'max_wait_ms': self.pool.max_wait_ms,
+        }
+        return {'commands': commands, 'pool': pool}
+
+    def log_summary(self, logger):
+        summary = self.summary()
+        pool = summary['pool']
+        logger.info(f"MongoDB pool: {pool['checkouts']} checkouts, mean wait {pool['mean_wait_ms']:.2f} ms, "
+                    f"max wait {pool['max_wait_ms']:.2f} ms, {pool['connections_created']} connections created")
+        for name, stats in sorted(summary['commands'].items(), key=lambda kv: -kv[1]['count'] * kv[1]['mean_ms']):
+            logger.info(f"MongoDB {name}: {stats['count']} ops, mean {stats['mean_ms']:.2f} ms, "
+                        f"max {stats['max_ms']:.2f} ms, {stats['failures']} failed")
+
+def create_client(db_config, metrics=None, **overrides):
+    """Build a MongoClient with the shared pool, compression and timeout settings.
+
+    ``overrides`` are passed straight to MongoClient (e.g. ``compressors`` in benchmarks).
+    """
+    options = {
+        'host': db_config['host'],
+        'port': db_config['port'],
+        'maxPoolSize': MONGO_CONFIG['max_pool_size'],
+        'minPoolSize': MONGO_CONFIG['min_pool_size'],
+        'waitQueueTimeoutMS': MONGO_CONFIG['wait_queue_timeout_ms'],
+        'appname': MONGO_CONFIG['app_name'],
+    }
+    if MONGO_CONFIG['compressors']:
+        options['compressors'] = MONGO_CONFIG['compressors']
+        options['zlibCompressionLevel'] = MONGO_CONFIG['zlib_compression_level']
+    if db_config.get('username') and db_config.get('password'):
+        options['username'] = db_config['username']
+        options['password'] = db_config['password']
+        options['authSource'] = db_config['database']
+    if metrics is not None:
+        options['event_listeners'] = metrics.listeners
+    options.update(overrides)
+    return pymongo.MongoClient(**options)
+
+def get_database(client, db_config, workload='default'):
+    """Return the configured database, tuned for ``workload``.
+
+    ``analytics`` reads (the large measurements aggregations used for training)
+    use the configured read preference and read concern so they can run on
+    secondaries instead of competing with ingestion writes on the primary.
+    """
+    if workload != 'analytics':
+        return client[db_config['database']]
+    name = MONGO_CONFIG['analytics_read_preference']
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference: {name}. Expected one of {list(READ_PREFERENCES)}")
+    if name == 'primary':
+        read_preference = Primary()
+    else:
+        read_preference = READ_PREFERENCES[name](max_staleness=MONGO_CONFIG['analytics_max_staleness_seconds'])
+    return client.get_database(
+        db_config['database'],
+        read_preference=read_preference,
+        read_concern=ReadConcern(MONGO_CONFIG['analytics_read_concern'])
+    )
@@ -0,0 +1,146 @@
+from imports import *
+
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_processing import preprocess_data
+
+def origin_windows(scaled_data: np.ndarray, sequence_length: int, horizon: int = 96, stride: int = 1,
+                   max_origins: int = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build every rolling forecast origin as strided views (no copies).
+
+    Returns (inputs, targets, origins): inputs is (n_origins, sequence_length,
+    n_features), targets is (n_origins, horizon) of the scaled import_kwh delta,
+    and origins holds the index of the first forecast step of each window.
+    ``max_origins`` keeps the most recent origins.
+    """
+    n = len(scaled_data)
+    if n < sequence_length + horizon:
+        raise ValueError(f"Need at least {sequence_length + horizon} rows for backtesting, got {n}")
+    inputs = sliding_window_view(scaled_data[:n - horizon], sequence_length, axis=0).transpose(0, 2, 1)
+    targets = sliding_window_view(scaled_data[sequence_length:, 0], horizon)
+    origins = np.arange(sequence_length, n - horizon + 1)
+    # Every stride-th origin ending at the latest one; basic slicing keeps the views
+    first = (len(origins) - 1) % stride
+    count = (len(origins) - 1 - first) // stride + 1
+    if max_origins is not None and count > max_origins:
+        first += (count - max_origins) * stride
+    return inputs[first::stride], targets[first::stride], origins[first::stride]
+
+def forecast_windows(model: "nn.Module", inputs: np.ndarray, batch_size: int = 1024) -> np.ndarray:
+    model.eval()
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(inputs), batch_size):
+            # Only the batch is materialised; the full origin tensor stays a view
+            x = torch.from_numpy(np.ascontiguousarray(inputs[start:start + batch_size], dtype=np.float32))
+            outputs.append(model(x.to(device)).squeeze(-1).cpu().numpy())
+    return np.concatenate(outputs)
+
+def horizon_metrics(actual: np.ndarray, predicted: np.ndarray, eps: float = 1e-6) -> Dict[str, np.ndarray]:
+    """Per-horizon MAE, MAPE and R² over the origins axis, plus overall scores."""
+    error = predicted - actual
+    abs_error = np.abs(error)
+    nonzero = np.abs(actual) > eps
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mape = np.where(nonzero, abs_error / np.abs(actual), np.nan)
+        ss_res = (error ** 2).sum(axis=0)
+        ss_tot = ((actual - actual.mean(axis=0)) ** 2).sum(axis=0)
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+        overall_ss_tot = ((actual - actual.mean()) ** 2).sum()
+        overall_r2 = 1 - ss_res.sum() / overall_ss_tot if overall_ss_tot > 0 else np.nan
+    return {
+        'mae': abs_error.mean(axis=0),
+        'mape': np.nanmean(mape, axis=0) * 100,
+        'r2': r2,
+        'overall_mae': float(abs_error.mean()),
+        'overall_mape': float(np.nanmean(mape) * 100),
+        'overall_r2': float(overall_r2),
+    }
+
+def backtest_model(model: "nn.Module", scaled_data: np.ndarray, scaler: "StandardScaler", sequence_length: int = 192,
+                   horizon: int = 96, stride: int = 1, max_origins: int = None, batch_size: int = 1024) -> Dict:
+    """Rolling-origin backtest of a trained model over a customer's scaled series.
+
+    Metrics are in kWh per interval (import_kwh deltas), with the same
+    non-negativity constraint as predict_next_timestep. Note that origins
+    inside the model's training range are in-sample.
+    """
+    inputs, targets, origins = origin_windows(scaled_data, sequence_length, horizon, stride, max_origins)
+    predicted = forecast_windows(model, inputs, batch_size)
+    mean, scale = scaler.mean_[0], scaler.scale_[0]
+    predicted = np.maximum(predicted * scale + mean, 0)
+    actual = targets * scale + mean
+    metrics = horizon_metrics(actual, predicted)
+    metrics['n_origins'] = len(origins)
+    metrics['first_origin'] = int(origins[0])
+    metrics['last_origin'] = int(origins[-1])
+    return metrics
+
+def backtest_customer(pipeline, customer_ref: int, sequence_length: int = 192, **kwargs) -> Dict:
+    df = pipeline.fetch_data(customer_ref)
+    if len(df) < sequence_length + 96:
+        pipeline.logger.warning(f"Insufficient data to backtest customer {customer_ref}")
+        return None
+    model, _, _, _, _ = pipeline.load_existing_model(customer_ref)
+    if model is None:
+        pipeline.logger.warning(f"No trained model to backtest for customer {customer_ref}")
+        return None
+    scaled_data, scaler, _ = preprocess_data(df, pipeline.logger)
+    start = time.perf_counter()
+    metrics = backtest_model(model, scaled_data, scaler, sequence_length, **kwargs)
+    metrics['customer_ref'] = customer_ref
+    metrics['time_s'] = time.perf_counter() - start
+    pipeline.logger.info(f"Backtested customer {customer_ref} over {metrics['n_origins']} origins in "
+                         f"{metrics['time_s']:.2f}s: MAE={metrics['overall_mae']:.4f}, "
+                         f"MAPE={metrics['overall_mape']:.1f}%, R²={metrics['overall_r2']:.4f}")
+    return metrics
+
+def backtest_customers(pipeline, customer_refs: List[int], max_workers: int = 4, **kwargs) -> List[Dict]:
+    """Backtest many customers in parallel; torch and the driver release the GIL for the heavy parts."""
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(backtest_customer, pipeline, ref, **kwargs): ref for ref in customer_refs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                pipeline.logger.error(f"Backtest failed for customer {futures[future]}: {e}")
+                continue
+            if result:
+                results.append(result)
+    return results
+
+if __name__ == "__main__":
+    from main import CustomerBehaviorPipeline, logger
+
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of stored customer models")
+    parser.add_argument('customer_refs', nargs='*', type=int, help="Customers to backtest (default: all)")
+    parser.add_argument('--sequence-length', type=int, default=192)
+    parser.add_argument('--stride', type=int, default=1, help="Step between origins, in 15-minute intervals")
+    parser.add_argument('--max-origins', type=int, default=1000, help="Most recent origins per customer")
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', default=f"backtest_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    args = parser.parse_args()
+
+    pipeline = CustomerBehaviorPipeline(logger=logger, plot_mode='off')
+    pipeline.connect_db()
+    try:
+        refs = args.customer_refs or pipeline.fetch_customer_refs()
+        start = time.perf_counter()
+        results = backtest_customers(pipeline, refs, max_workers=args.workers,
+                                     sequence_length=args.sequence_length, stride=args.stride,
+                                     max_origins=args.max_origins, batch_size=args.batch_size)
+        logger.info(f"Backtested {len(results)} customers in {time.perf_counter() - start:.1f}s")
+    finally:
+        pipeline.close_db()
+
+    with open(args.output, 'w') as f:
+        json.dump([{k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in r.items()} for r in results],
+                  f, indent=2)
+    logger.info(f"Backtest results written to {args.output}")
@@ -0,0 +1,76 @@
+from imports import *
+
+import argparse
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DB_CONFIG, MONGO_CONFIG
+from database_utils import DatabaseManager
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def network_counters(db_manager: DatabaseManager) -> Dict:
+    network = db_manager.client.admin.command('serverStatus').get('network', {})
+    return {'bytes_out': network.get('bytesOut', 0), 'physical_bytes_out': network.get('physicalBytesOut', 0)}
+
+def bench_compressor(name: str, customer_refs: List[int], repeats: int) -> Dict:
+    # create_client reads MONGO_CONFIG on every call
+    MONGO_CONFIG['compressors'] = '' if name == 'none' else name
+    db_manager = DatabaseManager(db_config=DB_CONFIG, logger=logger)
+    db_manager.connect()
+    try:
+        db_manager.fetch_data(customer_refs[0])  # warm up pool and server cache
+        db_manager.metrics.reset()
+        before = network_counters(db_manager)
+        times, rows = [], 0
+        for _ in range(repeats):
+            for ref in customer_refs:
+                start = time.perf_counter()
+                rows += len(db_manager.fetch_data(ref))
+                times.append(time.perf_counter() - start)
+        after = network_counters(db_manager)
+        commands = db_manager.metrics.summary()['commands']
+        return {
+            'compressor': name,
+            'fetches': len(times),
+            'rows': rows,
+            'total_s': sum(times),
+            'mean_fetch_s': sum(times) / len(times),
+            'server_bytes_out': after['bytes_out'] - before['bytes_out'],
+            'server_physical_bytes_out': after['physical_bytes_out'] - before['physical_bytes_out'],
+            'aggregate_mean_ms': commands.get('aggregate', {}).get('mean_ms', 0.0),
+            'getMore_mean_ms': commands.get('getMore', {}).get('mean_ms', 0.0),
+        }
+    finally:
+        db_manager.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Effect of wire compression on fetch_data transfer time")
+    parser.add_argument('--customers', type=int, nargs='*', help="Customer refs to fetch (default: first --sample refs)")
+    parser.add_argument('--sample', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--compressors', nargs='+', default=['none', 'zlib', 'snappy', 'zstd'])
+    parser.add_argument('--output', default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    customer_refs = args.customers
+    if not customer_refs:
+        db_manager = DatabaseManager(db_config=DB_CONFIG, logger=logger)
+        db_manager.connect()
+        customer_refs = db_manager.fetch_customer_refs()[:args.sample]
+        db_manager.close()
+
+    results = [bench_compressor(name, customer_refs, args.repeats) for name in args.compressors]
+    baseline = results[0]['mean_fetch_s']
+    print(f"{'compressor':<11}{'mean fetch s':>13}{'speedup':>9}{'wire MB':>10}{'logical MB':>12}")
+    for r in results:
+        print(f"{r['compressor']:<11}{r['mean_fetch_s']:>13.3f}{baseline / r['mean_fetch_s']:>8.2f}x"
+              f"{r['server_physical_bytes_out'] / 2 ** 20:>10.1f}{r['server_bytes_out'] / 2 ** 20:>12.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
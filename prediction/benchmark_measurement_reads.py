@@ -0,0 +1,92 @@
+from imports import *
+
+import argparse
+import json
+import tracemalloc
+
+from benchmark_pipeline import seed_database, logger
+from benchmark_utils import make_client
+from measurement_reader import MEASUREMENT_COLUMNS, flat_projection, read_measurements, resolve_decoder
+
+LEGACY_PROJECTION = {
+    "timestamp": 1, "metadata.serial": 1, "avg_import_kw": 1, "import_kwh": 1, "power_factor": 1,
+    "phases.A.instCurrent": 1, "phases.A.instVoltage": 1,
+    "phases.B.instCurrent": 1, "phases.B.instVoltage": 1,
+    "phases.C.instCurrent": 1, "phases.C.instVoltage": 1
+}
+
+def legacy_read(collection, match: Dict) -> "pd.DataFrame":
+    # The previous fetch_data decoding: nested documents, one dict per row, json_normalize
+    cursor = collection.aggregate([{"$match": match}, {"$sort": {"timestamp": 1}},
+                                   {"$project": LEGACY_PROJECTION}], allowDiskUse=True)
+    df = pd.json_normalize(list(cursor))
+    return df.rename(columns={path: name for name, (path, _) in MEASUREMENT_COLUMNS.items()})
+
+def bench_decoder(decoder: str, collection, match: Dict, repeats: int) -> Dict:
+    pipeline = [{"$match": match}, {"$sort": {"timestamp": 1}}, {"$project": flat_projection()}]
+    times, peaks = [], []
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if decoder == 'legacy':
+            df = legacy_read(collection, match)
+        else:
+            df = read_measurements(collection, pipeline, decoder)
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        rows = len(df)
+        frame_mb = df.memory_usage(deep=True).sum() / 2 ** 20
+        del df
+    return {
+        'decoder': decoder,
+        'rows': rows,
+        'mean_s': sum(times) / len(times),
+        'peak_mb': max(peaks) / 2 ** 20,
+        'frame_mb': frame_mb,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode time and peak memory of fetch_data's measurement reads")
+    parser.add_argument('--history-days', type=int, default=3 * 365)
+    parser.add_argument('--mongo-uri', default=None, help="Local MongoDB URI; mongomock is used when omitted")
+    parser.add_argument('--database', default='load_profiles_benchmark')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--decoders', nargs='+', default=['legacy', 'cursor', 'raw', 'arrow'])
+    parser.add_argument('--skip-seed', action='store_true', help="Reuse data seeded by a previous run")
+    parser.add_argument('--output', default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    client = make_client(args.mongo_uri)
+    db = client[args.database]
+    if not args.skip_seed:
+        seed_database(db, 1, args.history_days)
+    serials = [doc['_id'] for doc in db.meters.find({'customerRef': 1}, {'_id': 1})]
+    match = {"metadata.serial": {"$in": serials}, "timestamp": {"$ne": None}}
+
+    results = []
+    for decoder in args.decoders:
+        if decoder != 'legacy':
+            try:
+                resolve_decoder(db.measurements, decoder)
+            except ValueError as e:
+                logger.warning(f"Skipping {decoder}: {e}")
+                continue
+            if decoder == 'arrow' and resolve_decoder(db.measurements, 'auto') != 'arrow':
+                logger.warning("Skipping arrow: pymongoarrow is not installed")
+                continue
+        results.append(bench_decoder(decoder, db.measurements, match, args.repeats))
+    client.close()
+
+    # tracemalloc sees NumPy and Python allocations but not Arrow's own buffers
+    baseline = results[0]
+    print(f"{'decoder':<9}{'rows':>10}{'mean s':>9}{'speedup':>9}{'peak MB':>10}{'frame MB':>10}")
+    for r in results:
+        print(f"{r['decoder']:<9}{r['rows']:>10}{r['mean_s']:>9.2f}{baseline['mean_s'] / r['mean_s']:>8.1f}x"
+              f"{r['peak_mb']:>10.1f}{r['frame_mb']:>10.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+from imports import *
+
+import argparse
+import json
+import resource
+import tempfile
+
+from main import CustomerBehaviorPipeline, logger
+from benchmark_utils import make_client
+from database_utils import DatabaseManager
+from profiling import StageTimer
+
+def synthetic_measurements(serial: int, start: datetime, n_points: int, rng: np.random.Generator) -> List[Dict]:
+    t = np.arange(n_points)
+    load = np.clip(0.6 + 0.4 * np.sin(2 * np.pi * t / 96) + 0.1 * rng.standard_normal(n_points), 0.01, None)
+    import_kwh = np.cumsum(load / 4)
+    voltage = 230 + rng.standard_normal((n_points, 3))
+    current = load[:, None] * 1000 / 3 / voltage
+    return [
+        {
+            'timestamp': start + timedelta(minutes=15 * i),
+            'metadata': {'serial': serial, 'obis': '1.0.1.8.0'},
+            'avg_import_kw': float(load[i]),
+            'import_kwh': float(import_kwh[i]),
+            'power_factor': float(rng.uniform(0.85, 1.0)),
+            'phases': {
+                phase: {'instCurrent': float(current[i, j]), 'instVoltage': float(voltage[i, j])}
+                for j, phase in enumerate('ABC')
+            }
+        } for i in range(n_points)
+    ]
+
+def seed_database(db, n_customers: int, history_days: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_points = history_days * 96
+    start = datetime(2024, 1, 1)
+    for name in ('customers', 'meters', 'measurements', 'customer_model', 'customer_prediction'):
+        db[name].drop()
+    for ref in range(1, n_customers + 1):
+        serial = 100000 + ref
+        db.customers.insert_one({'_id': ref, 'customerRef': ref, 'createdAt': datetime.now()})
+        db.meters.insert_one({'_id': serial, 'customerRef': ref})
+        docs = synthetic_measurements(serial, start, n_points, rng)
+        for i in range(0, len(docs), 5000):
+            db.measurements.insert_many(docs[i:i + 5000], ordered=False)
+    logger.info(f"Seeded {n_customers} customers with {n_points} readings each")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CustomerBehaviorPipeline stage by stage")
+    parser.add_argument('--customers', type=int, default=5)
+    parser.add_argument('--history-days', type=int, default=30)
+    parser.add_argument('--mongo-uri', default=None, help="Local MongoDB URI; mongomock is used when omitted")
+    parser.add_argument('--database', default='load_profiles_benchmark')
+    parser.add_argument('--training-profile', default='default')
+    parser.add_argument('--plot-mode', default='sync', choices=['sync', 'deferred', 'lazy', 'off'])
+    parser.add_argument('--track-memory', action='store_true', help="Record peak Python heap per stage (slower)")
+    parser.add_argument('--torch-trace', default=None, help="Write a torch.profiler Chrome trace to this path")
+    parser.add_argument('--output', default=f"benchmark_pipeline_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    args = parser.parse_args()
+
+    # Created before the MongoDB client so deferred plot workers fork from a single-threaded process
+    output_dir = tempfile.mkdtemp(prefix='benchmark_pipeline_')
+    pipeline = CustomerBehaviorPipeline(logger=logger, output_base_dir=output_dir,
+                                        training_profile=args.training_profile, plot_mode=args.plot_mode)
+
+    db_config = {'database': args.database}
+    client = make_client(args.mongo_uri)
+    seed_database(client[args.database], args.customers, args.history_days)
+
+    pipeline.db_manager = DatabaseManager(db_config, logger, client=client)
+    pipeline.stage_timer = StageTimer(track_memory=args.track_memory, record_functions=bool(args.torch_trace))
+
+    start = time.perf_counter()
+    if args.torch_trace:
+        import torch.profiler
+
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as prof:
+            results = pipeline.run()
+        prof.export_chrome_trace(args.torch_trace)
+        logger.info(f"Saved torch.profiler trace: {args.torch_trace}")
+    else:
+        results = pipeline.run()
+    elapsed = time.perf_counter() - start
+    pipeline.plot_renderer.shutdown()
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report = {
+        'config': vars(args),
+        'backend': 'mongodb' if args.mongo_uri else 'mongomock',
+        'customers_processed': len(results),
+        'total_time_s': elapsed,
+        'customers_per_hour': len(results) / elapsed * 3600 if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb,
+        'stages': pipeline.stage_timer.summary(),
+        'plots': pipeline.plot_report,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print(f"{'stage':<18}{'count':>7}{'total s':>10}{'mean s':>10}{'share':>8}")
+    for name, stats in sorted(report['stages'].items(), key=lambda kv: -kv[1]['total_s']):
+        print(f"{name:<18}{stats['count']:>7}{stats['total_s']:>10.3f}{stats['mean_s']:>10.3f}"
+              f"{100 * stats['total_s'] / elapsed:>7.1f}%")
+    print(f"{report['customers_processed']} customers in {elapsed:.1f}s "
+          f"({report['customers_per_hour']:.0f} customers/hour), peak RSS {peak_rss_mb:.0f} MB")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from imports import *
+
+import argparse
+import json
+
+from benchmark_utils import make_client
+from prediction_utils import save_prediction_to_db
+from prediction_writer import PredictionWriter
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def synthetic_predictions(n_customers: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    start_time = datetime(2024, 6, 1)
+    for ref in range(1, n_customers + 1):
+        delta = rng.uniform(0, 0.5, 96)
+        yield ref, 1000.0 + np.cumsum(delta), delta, start_time
+
+def bench_per_customer(db, n_customers: int) -> float:
+    db.customer_prediction.create_index([("customer_ref", 1), ("prediction_timestamp", -1)])
+    start = time.perf_counter()
+    for ref, pred_abs, pred_delta, start_time in synthetic_predictions(n_customers):
+        save_prediction_to_db(db, ref, pred_abs, pred_delta, start_time, logger)
+    return time.perf_counter() - start
+
+def bench_buffered(db, n_customers: int, layout: str, flush_size: int) -> float:
+    writer = PredictionWriter(db, logger, layout=layout, flush_size=flush_size)
+    writer.ensure_indexes()
+    start = time.perf_counter()
+    for ref, pred_abs, pred_delta, start_time in synthetic_predictions(n_customers):
+        writer.add(ref, pred_abs, pred_delta, start_time)
+    writer.flush()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prediction persistence strategies")
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--flush-size', type=int, default=500)
+    parser.add_argument('--mongo-uri', default=None, help="Local MongoDB URI; mongomock is used when omitted")
+    parser.add_argument('--database', default='load_profiles_benchmark')
+    parser.add_argument('--output', default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    client = make_client(args.mongo_uri)
+    db = client[args.database]
+    strategies = {
+        'per_customer': lambda: bench_per_customer(db, args.customers),
+        'buffered_rows': lambda: bench_buffered(db, args.customers, 'rows', args.flush_size),
+        'buffered_compact': lambda: bench_buffered(db, args.customers, 'compact', args.flush_size),
+    }
+
+    results = []
+    for name, bench in strategies.items():
+        # Each strategy runs twice: first into empty collections, then replacing existing forecasts
+        db.customer_prediction.drop()
+        db.customer_forecast.drop()
+        for phase in ('insert', 'replace'):
+            elapsed = bench()
+            results.append({
+                'strategy': name,
+                'phase': phase,
+                'customers': args.customers,
+                'time_s': elapsed,
+                'customers_per_s': args.customers / elapsed,
+            })
+
+    print(f"{'strategy':<18}{'phase':<9}{'time s':>9}{'customers/s':>13}{'speedup':>9}")
+    baseline = {r['phase']: r['time_s'] for r in results if r['strategy'] == 'per_customer'}
+    for r in results:
+        print(f"{r['strategy']:<18}{r['phase']:<9}{r['time_s']:>9.2f}{r['customers_per_s']:>13.0f}"
+              f"{baseline[r['phase']] / r['time_s']:>8.1f}x")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from imports import *
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+PREDICTION_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(PREDICTION_DIR)
+
+# What each entry mode has to import before it can do its work
+ENTRY_MODES = {
+    'interpreter': "pass",
+    'cached_predictions': "from prediction_writer import load_prediction",
+    'inference': "from inference import load_scripted_model, forecast",
+    'plotting': "from plotting import render_prediction_plot\nimport matplotlib.figure",
+    'training': "import main",
+}
+
+HEAVY_MODULES = ('torch', 'pandas', 'sklearn', 'matplotlib', 'pyarrow', 'pymongo')
+
+CHILD_TEMPLATE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_s': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+def measure(mode: str, workdir: str) -> Dict:
+    code = CHILD_TEMPLATE.format(statement=ENTRY_MODES[mode], heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PREDICTION_DIR, REPO_DIR]))
+    start = time.perf_counter()
+    # Run from a scratch directory so entry points that create log files don't litter the repo
+    output = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result['wall_s'] = wall
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and RSS of each prediction entry mode")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--modes', nargs='+', default=list(ENTRY_MODES))
+    parser.add_argument('--output', default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes:
+            runs = [measure(mode, workdir) for _ in range(args.repeats)]
+            results.append({
+                'mode': mode,
+                'import_s': statistics.median(r['import_s'] for r in runs),
+                'wall_s': statistics.median(r['wall_s'] for r in runs),
+                'max_rss_mb': statistics.median(r['max_rss_mb'] for r in runs),
+                'loaded': runs[-1]['loaded'],
+            })
+
+    print(f"{'mode':<20}{'import s':>10}{'wall s':>9}{'RSS MB':>9}  heavy modules loaded")
+    for r in results:
+        print(f"{r['mode']:<20}{r['import_s']:>10.2f}{r['wall_s']:>9.2f}{r['max_rss_mb']:>9.0f}  "
+              f"{', '.join(r['loaded']) or '-'}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
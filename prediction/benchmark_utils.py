@@ -0,0 +1,8 @@
+"""Helpers shared by the benchmark scripts; keep this free of torch and the pipeline."""
+from imports import *
+
+def make_client(mongo_uri: str):
+    if mongo_uri:
+        return pymongo.MongoClient(mongo_uri)
+    import mongomock
+    return mongomock.MongoClient()
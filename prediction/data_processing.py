@@ -1,5 +1,8 @@
 from imports import *
 
+import torch
+from torch.utils.data import Dataset
+
 class ElectricityDataset(Dataset):
     def __init__(self, data: np.ndarray, sequence_length: int):
         self.data = data
@@ -15,12 +18,64 @@ class ElectricityDataset(Dataset):
             raise ValueError("Not enough data to create label")
         return torch.FloatTensor(x), torch.FloatTensor(y).unsqueeze(-1)
 
-def preprocess_data(df: pd.DataFrame, logger: logging.Logger) -> tuple[np.ndarray, StandardScaler, np.ndarray]:
+WINDOW_SAMPLING_STRATEGIES = ('all', 'cap', 'recency', 'stride')
+
+def window_starts(dataset: Dataset) -> np.ndarray:
+    """Start index in the series of every window of an ElectricityDataset or a Subset of one."""
+    if isinstance(dataset, torch.utils.data.Subset):
+        return window_starts(dataset.dataset)[np.asarray(dataset.indices)]
+    return np.arange(len(dataset))
+
+def window_sampler(dataset: Dataset, sampling: Dict) -> "torch.utils.data.Sampler":
+    """Sampler bounding how many training windows one epoch visits.
+
+    - ``all``: every window, shuffled (the original behaviour).
+    - ``cap``: a fresh uniform random draw of at most ``max_windows`` per epoch.
+    - ``recency``: at most ``max_windows`` per epoch, drawn with weights that
+      halve every ``half_life_days`` back from the newest window.
+    - ``stride``: only windows whose start is a multiple of ``stride``, shuffled.
+    """
+    strategy = sampling['strategy']
+    n = len(dataset)
+    if strategy == 'all':
+        return torch.utils.data.RandomSampler(dataset)
+    if strategy == 'cap':
+        return torch.utils.data.RandomSampler(dataset, num_samples=min(sampling['max_windows'], n))
+    if strategy == 'recency':
+        starts = window_starts(dataset)
+        half_life_windows = sampling['half_life_days'] * 96
+        weights = np.power(0.5, (starts.max() - starts) / half_life_windows)
+        return torch.utils.data.WeightedRandomSampler(torch.as_tensor(weights, dtype=torch.double),
+                                                      num_samples=min(sampling['max_windows'], n),
+                                                      replacement=False)
+    if strategy == 'stride':
+        positions = np.flatnonzero(window_starts(dataset) % sampling['stride'] == 0)
+        return torch.utils.data.SubsetRandomSampler(positions.tolist())
+    raise ValueError(f"Unknown window sampling strategy: {strategy}. Expected one of {WINDOW_SAMPLING_STRATEGIES}")
+
+def bound_validation(dataset: Dataset, sampling: Dict) -> Dataset:
+    """Evenly spaced subset of the validation windows so validation cost is bounded too."""
+    if sampling['strategy'] == 'all':
+        return dataset
+    if sampling['strategy'] == 'stride':
+        positions = np.flatnonzero(window_starts(dataset) % sampling['stride'] == 0)
+    else:
+        limit = max(sampling['max_windows'] // 4, 1)
+        if len(dataset) <= limit:
+            return dataset
+        positions = np.linspace(0, len(dataset) - 1, limit).astype(int)
+    return torch.utils.data.Subset(dataset, positions.tolist())
+
+FEATURES = ['import_kwh', 'avg_import_kw', 'power_factor',
+            'phase_a_current', 'phase_a_voltage',
+            'phase_b_current', 'phase_b_voltage',
+            'phase_c_current', 'phase_c_voltage']
+
+def preprocess_data(df: "pd.DataFrame", logger: logging.Logger) -> tuple[np.ndarray, "StandardScaler", np.ndarray]:
+    from sklearn.preprocessing import StandardScaler
+
     try:
-        features = ['import_kwh', 'avg_import_kw', 'power_factor',
-                    'phase_a_current', 'phase_a_voltage',
-                    'phase_b_current', 'phase_b_voltage',
-                    'phase_c_current', 'phase_c_voltage']
+        features = FEATURES
         original_import_kwh = df['import_kwh'].copy()
         df['import_kwh_diff'] = df['import_kwh'].diff().fillna(0)
         df['import_kwh'] = df['import_kwh_diff']
@@ -32,4 +87,19 @@ def preprocess_data(df: pd.DataFrame, logger: logging.Logger) -> tuple[np.ndarra
         return scaled_data, scaler, original_import_kwh.values
     except Exception as e:
         logger.error(f"Failed to preprocess data: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def scale_last_window(df: "pd.DataFrame", mean: np.ndarray, scale: np.ndarray, sequence_length: int) -> np.ndarray:
+    """Last input window scaled with stored scaler parameters, without refitting.
+
+    Applies the same transformation as preprocess_data (import_kwh as first
+    differences, forward-filled gaps, remaining gaps zeroed) in NumPy and
+    leaves ``df`` unchanged.
+    """
+    values = df[FEATURES].to_numpy(dtype=float, copy=True)
+    diff = np.diff(values[:, 0], prepend=np.nan)
+    values[:, 0] = np.where(np.isnan(diff), 0, diff)
+    last_valid = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    window = values[last_valid[-sequence_length:], np.arange(values.shape[1])]
+    return (np.nan_to_num(window, nan=0.0) - mean) / scale
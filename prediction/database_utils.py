@@ -1,20 +1,32 @@
 from imports import *
 
+from mongo_connection import MongoMetrics, create_client, get_database
+from measurement_reader import MEASUREMENT_COLUMNS, flat_projection, read_measurements
+
 class DatabaseManager:
-    def __init__(self, db_config, logger: logging.Logger):
+    def __init__(self, db_config, logger: logging.Logger, client: "pymongo.MongoClient" = None, cold_storage=None,
+                 measurement_decoder: str = 'auto'):
         self.db_config = db_config
-        self.client = None
+        self.client = client
+        self.cold_storage = cold_storage
+        self.measurement_decoder = measurement_decoder
         self.db = None
+        # Measurement reads for training; may be served by secondaries
+        self.analytics_db = None
+        self.metrics = MongoMetrics()
         self.logger = logger
 
     def connect(self):
         try:
-            if self.db_config.get('username') and self.db_config.get('password'):
-                connection_string = f"mongodb://{self.db_config['username']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
-            else:
-                connection_string = f"mongodb://{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
-            self.client = pymongo.MongoClient(connection_string)
-            self.db = self.client[self.db_config['database']]
+            if self.client is not None:
+                # Pre-built client (e.g. mongomock in benchmarks)
+                self.db = self.client[self.db_config['database']]
+                self.analytics_db = self.db
+                self.logger.info("Using provided MongoDB client")
+                return
+            self.client = create_client(self.db_config, metrics=self.metrics)
+            self.db = get_database(self.client, self.db_config)
+            self.analytics_db = get_database(self.client, self.db_config, workload='analytics')
             self.client.admin.command('ping')
             self.logger.info("Connected to MongoDB")
         except pymongo.errors.PyMongoError as e:
@@ -23,48 +35,89 @@ class DatabaseManager:
 
     def close(self):
         if self.client:
+            self.metrics.log_summary(self.logger)
             self.client.close()
             self.logger.info("MongoDB connection closed")
 
     def fetch_customer_refs(self):
         try:
-            customer_refs = self.db.meters.distinct("customerRef")
+            customer_refs = self.analytics_db.meters.distinct("customerRef")
             self.logger.info(f"Fetched {len(customer_refs)} customer references")
             return [int(ref) for ref in customer_refs]
         except pymongo.errors.PyMongoError as e:
             self.logger.error(f"Error fetching customer references: {e}")
             raise
 
-    def fetch_data(self, customer_ref):
+    def fetch_dirty_customers(self) -> List[Dict]:
+        try:
+            docs = list(self.db.dirty_customers.find({}, {"firstDirtyAt": 1, "newMeasurements": 1, "version": 1,
+                                                          "failures": 1, "retryAfter": 1}))
+            self.logger.info(f"Fetched {len(docs)} customers with new measurements")
+            return docs
+        except pymongo.errors.PyMongoError as e:
+            self.logger.error(f"Error fetching dirty customers: {e}")
+            raise
+
+    def clear_dirty_customer(self, customer_ref: int, version: int) -> bool:
+        # Only clear if ingestion has not marked the customer again since we read it
         try:
-            meter_docs = self.db.meters.find({"customerRef": customer_ref}, {"_id": 1})
+            result = self.db.dirty_customers.delete_one({"_id": customer_ref, "version": version})
+            return result.deleted_count == 1
+        except pymongo.errors.PyMongoError as e:
+            self.logger.error(f"Error clearing dirty flag for customer {customer_ref}: {e}")
+            raise
+
+    def defer_dirty_customer(self, customer_ref: int, version: int, base_delay: timedelta,
+                             max_delay: timedelta) -> bool:
+        # Keep the flag of a failed customer but back off exponentially before retrying it
+        try:
+            doc = self.db.dirty_customers.find_one_and_update(
+                {"_id": customer_ref, "version": version},
+                {"$inc": {"failures": 1}},
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if doc is None:
+                return False
+            delay = min(base_delay * 2 ** (doc["failures"] - 1), max_delay)
+            self.db.dirty_customers.update_one({"_id": customer_ref, "version": version},
+                                               {"$set": {"retryAfter": datetime.now() + delay}})
+            self.logger.info(f"Deferred customer {customer_ref} for {delay} after {doc['failures']} failures")
+            return True
+        except pymongo.errors.PyMongoError as e:
+            self.logger.error(f"Error deferring dirty customer {customer_ref}: {e}")
+            raise
+
+    def fetch_data(self, customer_ref, start: datetime = None, end: datetime = None):
+        try:
+            meter_docs = self.analytics_db.meters.find({"customerRef": customer_ref}, {"_id": 1})
             serials = [doc["_id"] for doc in meter_docs]
             if not serials:
                 self.logger.warning(f"No meters found for customer {customer_ref}")
                 return pd.DataFrame()
 
+            time_filter = {"$ne": None}
+            if start is not None:
+                time_filter["$gte"] = start
+            if end is not None:
+                time_filter["$lt"] = end
             pipeline = [
                 {"$match": {
                     "metadata.serial": {"$in": serials},
-                    "timestamp": {"$ne": None}
+                    "timestamp": time_filter
                 }},
                 {"$sort": {"timestamp": 1}},
-                {"$project": {
-                    "timestamp": 1,
-                    "avg_import_kw": 1,
-                    "import_kwh": 1,
-                    "power_factor": 1,
-                    "phases.A.instCurrent": 1,
-                    "phases.A.instVoltage": 1,
-                    "phases.B.instCurrent": 1,
-                    "phases.B.instVoltage": 1,
-                    "phases.C.instCurrent": 1,
-                    "phases.C.instVoltage": 1
-                }}
+                # Flattened and renamed on the server; documents arrive with the final column names
+                {"$project": flat_projection()}
             ]
 
-            cursor = self.db.measurements.aggregate(pipeline, allowDiskUse=True)
-            df = pd.DataFrame(list(cursor))
+            df = read_measurements(self.analytics_db.measurements, pipeline, self.measurement_decoder)
+
+            if self.cold_storage is not None:
+                # Stitch archived (cold) readings in front of the hot ones
+                cold_df = self.cold_storage.read(serials, start, end, columns=list(MEASUREMENT_COLUMNS))
+                if not cold_df.empty:
+                    df = pd.concat([cold_df, df], ignore_index=True)
+                    df = df.drop_duplicates(subset=['serial', 'timestamp'], keep='last')
 
             if df.empty:
                 self.logger.warning(f"No measurements found for customer {customer_ref}")
@@ -84,16 +137,6 @@ class DatabaseManager:
                 self.logger.warning(f"Dropped {dropped} rows with invalid timestamps for customer {customer_ref}")
                 df = df[valid_range]
 
-            rename_map = {
-                'phases.A.instCurrent': 'phase_a_current',
-                'phases.A.instVoltage': 'phase_a_voltage',
-                'phases.B.instCurrent': 'phase_b_current',
-                'phases.B.instVoltage': 'phase_b_voltage',
-                'phases.C.instCurrent': 'phase_c_current',
-                'phases.C.instVoltage': 'phase_c_voltage'
-            }
-            df = df.rename(columns=rename_map)
-
             expected_columns = [
                 'timestamp', 'import_kwh', 'avg_import_kw', 'power_factor',
                 'phase_a_current', 'phase_a_voltage',
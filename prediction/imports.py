@@ -1,21 +1,37 @@
+import importlib
 import io
 import logging
 import os
 import sys
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import pymongo
-from pymongo.errors import PyMongoError
-import pytz
-from dotenv import load_dotenv
-from sklearn.metrics import r2_score
-from sklearn.preprocessing import StandardScaler
 
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from torch.utils.data import DataLoader, Dataset
\ No newline at end of file
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access.
+
+    Lets every module share ``from imports import *`` while entry points that
+    never touch pandas, torch or pymongo (e.g. serving cached predictions)
+    don't pay for importing them. Annotations using these names must be quoted.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+# Heavy dependencies; matplotlib and scikit-learn are imported only inside the
+# plotting and fitting code that needs them.
+pd = LazyModule('pandas')
+pymongo = LazyModule('pymongo')
+torch = LazyModule('torch')
@@ -0,0 +1,32 @@
+"""Lightweight inference runtime.
+
+Deliberately imports only NumPy and torch (no pandas, scikit-learn or
+matplotlib), so processes that only load stored TorchScript models and
+forecast from an already-scaled window start fast and stay small.
+"""
+import io
+
+import numpy as np
+import torch
+
+def inference_device() -> "torch.device":
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+def load_scripted_model(model_data: bytes) -> "torch.jit.ScriptModule":
+    model = torch.jit.load(io.BytesIO(model_data), map_location=inference_device())
+    model.eval()
+    return model
+
+def forecast(model: "torch.nn.Module", last_sequence: np.ndarray, target_mean: float, target_scale: float,
+             last_kwh: float) -> tuple[np.ndarray, np.ndarray]:
+    """Forecast the next 96 intervals from one scaled input window.
+
+    Returns (cumulative kWh, kWh delta per interval); deltas are un-scaled with
+    the import_kwh column's mean/scale and clipped at zero.
+    """
+    model.eval()
+    x = torch.as_tensor(np.asarray(last_sequence, dtype=np.float32)).unsqueeze(0).to(inference_device())
+    with torch.inference_mode():
+        pred = model(x).cpu().numpy().reshape(-1)
+    pred_kwh_delta = np.maximum(pred * target_scale + target_mean, 0)
+    return last_kwh + np.cumsum(pred_kwh_delta), pred_kwh_delta
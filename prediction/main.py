@@ -1,30 +1,58 @@
 from imports import *
 
+import heapq
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from config import DB_CONFIG, OUTPUT_BASE_DIR
+from config import (DB_CONFIG, OUTPUT_BASE_DIR, TRAINING_PROFILE, TRAINING_SAMPLING, PREDICTION_SCHEDULE, PREDICTION_COORDINATION,
+                    DIRTY_RETRY_BASE_MINUTES, DIRTY_RETRY_MAX_HOURS, PREDICTION_RUN_ID, WORK_LEASE_SECONDS,
+                    PLOT_MODE, PREDICTION_LAYOUT, PREDICTION_FLUSH_SIZE, COLD_STORAGE_URI, MEASUREMENT_DECODER)
+from leases import LeaseManager
 from database_utils import DatabaseManager
-from data_processing import ElectricityDataset, preprocess_data
+from data_processing import ElectricityDataset, preprocess_data, scale_last_window
 from model_definition import BiLSTM
-from model_training import train_model
-from prediction_utils import predict_next_timestep, create_prediction_plot, save_prediction_to_db, save_model_to_db
+from model_training import train_model, get_training_profile, build_data_loaders
+from prediction_utils import predict_next_timestep, save_model_to_db
+from inference import load_scripted_model, forecast
+from prediction_writer import PredictionWriter
+from plotting import PlotRenderer
+from profiling import StageTimer
 from logger import setup_logger
 
 logger = setup_logger()
 
 class CustomerBehaviorPipeline:
-    def __init__(self, logger: logging.Logger, output_base_dir: str = f"{OUTPUT_BASE_DIR}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"):
-        self.db_manager = DatabaseManager(db_config=DB_CONFIG, logger=logger)
+    def __init__(self, logger: logging.Logger, output_base_dir: str = f"{OUTPUT_BASE_DIR}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}",
+                 training_profile: str = TRAINING_PROFILE, plot_mode: str = PLOT_MODE,
+                 prediction_layout: str = PREDICTION_LAYOUT, training_sampling: Dict = TRAINING_SAMPLING):
+        cold_storage = None
+        if COLD_STORAGE_URI:
+            # pyarrow is only needed when an archive is configured
+            from cold_storage import ColdStorage
+            cold_storage = ColdStorage(COLD_STORAGE_URI, logger)
+        self.db_manager = DatabaseManager(db_config=DB_CONFIG, logger=logger, cold_storage=cold_storage,
+                                          measurement_decoder=MEASUREMENT_DECODER)
         self.output_base_dir = output_base_dir
         self.logger = logger
+        self.training_profile = get_training_profile(training_profile)
+        self.training_sampling = training_sampling
+        self.stage_timer = StageTimer()
+        self.plot_renderer = PlotRenderer(plot_mode, self.output_base_dir, self.logger)
+        self.prediction_layout = prediction_layout
+        self.prediction_writer = None
         if not os.path.exists(self.output_base_dir):
             os.makedirs(self.output_base_dir)
             self.logger.info(f"Created output directory: {self.output_base_dir}")
 
     def connect_db(self):
         self.db_manager.connect()
+        self.prediction_writer = PredictionWriter(self.db_manager.db, self.logger, self.prediction_layout,
+                                                  PREDICTION_FLUSH_SIZE)
+        self.prediction_writer.ensure_indexes()
 
     def close_db(self):
+        if self.prediction_writer is not None:
+            self.prediction_writer.flush()
         self.db_manager.close()
 
     def fetch_customer_refs(self) -> List[int]:
@@ -33,7 +61,7 @@ class CustomerBehaviorPipeline:
     def fetch_data(self, customer_ref: int) -> "pd.DataFrame":
         return self.db_manager.fetch_data(customer_ref)
 
-    def load_existing_model(self, customer_ref: int) -> tuple["BiLSTM", float, float, datetime]:
+    def load_existing_model(self, customer_ref: int) -> tuple["BiLSTM", float, float, datetime, tuple]:
         try:
             result = self.db_manager.db.customer_model.find_one({"customer_ref": customer_ref})
             if result:
@@ -41,75 +69,96 @@ class CustomerBehaviorPipeline:
                 mse = result.get('mse')
                 r2_score = result.get('r2_score')
                 last_trained_time = result.get('last_trained_data_timestamp')
-                model = BiLSTM(input_size=9)
-                buffer = io.BytesIO(model_data)
-                model = torch.jit.load(buffer)
+                # Models saved before the scaler parameters were stored have none
+                scaler_params = None
+                if result.get('scaler_mean') is not None:
+                    scaler_params = (np.asarray(result['scaler_mean']), np.asarray(result['scaler_scale']))
+                model = load_scripted_model(model_data)
                 self.logger.info(f"Loaded existing model for customer {customer_ref}")
-                return model, mse, r2_score, last_trained_time
+                return model, mse, r2_score, last_trained_time, scaler_params
             self.logger.info(f"No existing model for customer {customer_ref}")
-            return None, None, None, None
+            return None, None, None, None, None
         except Exception as e:
             self.logger.error(f"Error loading model for customer {customer_ref}: {e}")
             raise
 
-    def process_customer(self, customer_ref: int, sequence_length: int = 192, batch_size: int = 32):
+    def process_customer(self, customer_ref: int, sequence_length: int = 192, batch_size: int = None):
         try:
             self.logger.info(f"Processing customer {customer_ref}")
-            df = self.fetch_data(customer_ref)
+            with self.stage_timer.stage('fetch_data'):
+                df = self.fetch_data(customer_ref)
             if len(df) < sequence_length + 96:
                 self.logger.warning(f"Insufficient data for customer {customer_ref}")
-                return None
+                return {'customer_ref': customer_ref, 'status': 'insufficient_data'}
 
             current_max_timestamp = df['timestamp'].max()
-            model, prev_mse, prev_r2, last_trained_time = self.load_existing_model(customer_ref)
+            with self.stage_timer.stage('load_model'):
+                model, prev_mse, prev_r2, last_trained_time, scaler_params = self.load_existing_model(customer_ref)
 
             if last_trained_time and current_max_timestamp <= last_trained_time:
                 self.logger.info(f"Skipping training for {customer_ref} — no new data")
                 last_kwh = df['import_kwh'].iloc[-1]
-                scaled_data, scaler, orig_kwh = preprocess_data(df, self.logger)
-                last_seq = scaled_data[-sequence_length:]
-                pred_abs, pred_delta = predict_next_timestep(model, last_seq, scaler, last_kwh, self.logger)
+                with self.stage_timer.stage('preprocess'):
+                    if scaler_params is None:
+                        scaled_data, scaler, orig_kwh = preprocess_data(df, self.logger)
+                        df['import_kwh'] = orig_kwh
+                        scaler_params = (scaler.mean_, scaler.scale_)
+                        last_seq = scaled_data[-sequence_length:]
+                    else:
+                        last_seq = scale_last_window(df, *scaler_params, sequence_length)
+                with self.stage_timer.stage('predict'):
+                    mean, scale = scaler_params
+                    pred_abs, pred_delta = forecast(model, last_seq, mean[0], scale[0], last_kwh)
                 next_time = df['timestamp'].iloc[-1] + timedelta(minutes=15)
-                df_plot = df.copy()
-                df_plot['import_kwh'] = orig_kwh
-                plot_path = create_prediction_plot(df_plot, pred_abs, customer_ref, sequence_length, self.output_base_dir, self.logger)
-                save_prediction_to_db(self.db_manager.db, customer_ref, pred_abs, pred_delta, next_time, self.logger)
+                with self.stage_timer.stage('save_predictions'):
+                    self.prediction_writer.add(customer_ref, pred_abs, pred_delta, next_time)
+                with self.stage_timer.stage('plot'):
+                    plot_path = self.plot_renderer.submit(df, pred_abs, customer_ref, sequence_length)
                 return {
                     'customer_ref': customer_ref,
+                    'status': 'predicted',
                     'predictions': pred_abs,
                     'plot_path': plot_path,
                     'skipped_training': True
                 }
 
             last_kwh = df['import_kwh'].iloc[-1]
-            scaled_data, scaler, orig_kwh = preprocess_data(df, self.logger)
+            with self.stage_timer.stage('preprocess'):
+                scaled_data, scaler, orig_kwh = preprocess_data(df, self.logger)
             dataset = ElectricityDataset(scaled_data, sequence_length)
             if len(dataset) < 2:
                 self.logger.warning(f"Not enough sequences for training customer {customer_ref}")
-                return None
+                return {'customer_ref': customer_ref, 'status': 'insufficient_data'}
 
             train_size = int(0.8 * len(dataset))
             val_size = len(dataset) - train_size
             train_dataset, val_dataset = torch.utils.data.random_split(dataset, [train_size, val_size])
-            train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-            val_loader = DataLoader(val_dataset, batch_size=batch_size)
+            train_loader, val_loader = build_data_loaders(train_dataset, val_dataset, self.training_profile, batch_size,
+                                                       self.training_sampling)
 
             if model is None:
                 model = BiLSTM(input_size=9)
                 self.logger.info(f"Created new model for customer {customer_ref}")
 
-            model, mse, r2 = train_model(model, train_loader, val_loader, logger=self.logger)
+            with self.stage_timer.stage('train'):
+                model, mse, r2 = train_model(model, train_loader, val_loader, logger=self.logger,
+                                             profile=self.training_profile)
             last_seq = scaled_data[-sequence_length:]
-            pred_abs, pred_delta = predict_next_timestep(model, last_seq, scaler, last_kwh, self.logger)
-            df_plot = df.copy()
-            df_plot['import_kwh'] = orig_kwh
-            plot_path = create_prediction_plot(df_plot, pred_abs, customer_ref, sequence_length, self.output_base_dir, self.logger)
+            with self.stage_timer.stage('predict'):
+                pred_abs, pred_delta = predict_next_timestep(model, last_seq, scaler, last_kwh, self.logger)
             next_time = df['timestamp'].iloc[-1] + timedelta(minutes=15)
-            save_prediction_to_db(self.db_manager.db, customer_ref, pred_abs, pred_delta, next_time, self.logger)
-            save_model_to_db(self.db_manager.db, model, customer_ref, mse, r2, current_max_timestamp, self.logger)
+            with self.stage_timer.stage('save_predictions'):
+                self.prediction_writer.add(customer_ref, pred_abs, pred_delta, next_time)
+            with self.stage_timer.stage('save_model'):
+                save_model_to_db(self.db_manager.db, model, customer_ref, scaler, mse, r2, current_max_timestamp,
+                                 self.logger)
+            with self.stage_timer.stage('plot'):
+                df['import_kwh'] = orig_kwh
+                plot_path = self.plot_renderer.submit(df, pred_abs, customer_ref, sequence_length)
 
             return {
                 'customer_ref': customer_ref,
+                'status': 'trained',
                 'predictions': pred_abs,
                 'plot_path': plot_path,
                 'mse': mse,
@@ -119,25 +168,129 @@ class CustomerBehaviorPipeline:
             self.logger.error(f"Failed to process customer {customer_ref}: {e}")
             return None
 
-    def run(self, sequence_length: int = 192, batch_size: int = 32) -> List[Dict]:
+    def build_work_queue(self, schedule: str) -> tuple[List[tuple], Dict[int, int]]:
+        """Return a heap of (priority, customer_ref) plus the dirty-index version seen for each customer.
+
+        'changed' only queues customers flagged by ingestion, oldest change first,
+        skipping those still backing off after a failure; 'full' queues every
+        customer but still records versions so flags get cleared.
+        """
+        dirty_docs = self.db_manager.fetch_dirty_customers()
+        dirty_versions = {int(doc['_id']): doc.get('version', 0) for doc in dirty_docs}
+        if schedule == 'changed':
+            now = datetime.now()
+            queue = [(doc.get('firstDirtyAt') or datetime.min, int(doc['_id'])) for doc in dirty_docs
+                     if not doc.get('retryAfter') or doc['retryAfter'] <= now]
+            if len(queue) < len(dirty_docs):
+                self.logger.info(f"{len(dirty_docs) - len(queue)} flagged customers are backing off after failures")
+        elif schedule == 'full':
+            queue = [(datetime.min, ref) for ref in self.fetch_customer_refs()]
+        else:
+            raise ValueError(f"Unknown prediction schedule: {schedule}")
+        heapq.heapify(queue)
+        self.logger.info(f"Queued {len(queue)} customers for prediction ({schedule} schedule)")
+        return queue, dirty_versions
+
+    def settle_dirty_flag(self, customer_ref: int, version: int, result: Dict):
+        """Clear or defer a customer's dirty flag after processing it at ``version``."""
+        if version is None:
+            return
+        if result is None:
+            self.db_manager.defer_dirty_customer(customer_ref, version, timedelta(minutes=DIRTY_RETRY_BASE_MINUTES),
+                                                 timedelta(hours=DIRTY_RETRY_MAX_HOURS))
+        elif result['status'] == 'insufficient_data':
+            # Nothing to predict from yet; the next ingestion flags the customer again
+            self.db_manager.clear_dirty_customer(customer_ref, version)
+        else:
+            # Only once the buffered prediction is actually stored
+            self.prediction_writer.after_flush(
+                lambda: self.db_manager.clear_dirty_customer(customer_ref, version))
+
+    def run_local(self, queue: List[tuple], dirty_versions: Dict[int, int], sequence_length: int,
+                  batch_size: int) -> List[Dict]:
+        results = []
+        while queue:
+            _, ref = heapq.heappop(queue)
+            result = self.process_customer(ref, sequence_length, batch_size)
+            self.settle_dirty_flag(ref, dirty_versions.get(ref), result)
+            if result and result['status'] != 'insufficient_data':
+                results.append(result)
+        return results
+
+    def run_leased(self, queue: List[tuple], dirty_versions: Dict[int, int], sequence_length: int,
+                   batch_size: int, run_id: str = PREDICTION_RUN_ID) -> List[Dict]:
+        """Share the run with other workers through leases in the work_leases collection.
+
+        Every worker seeds the same run (idempotently) and then claims customers one
+        at a time until none are pending or leased; leases held by a crashed worker
+        expire and are claimed again by the survivors.
+        """
+        if not run_id:
+            raise ValueError("PREDICTION_RUN_ID must be set when PREDICTION_COORDINATION=leases")
+        group = f"prediction:{run_id}"
+        leases = LeaseManager(self.db_manager.db.work_leases, self.logger, lease_seconds=WORK_LEASE_SECONDS)
+        ordered = [heapq.heappop(queue) for _ in range(len(queue))]
+        # Customers flagged again since this run id last processed them are redone
+        leases.seed(group, [(ref, rank, {'dirtyVersion': dirty_versions.get(ref)})
+                            for rank, (_, ref) in enumerate(ordered)], reset_on_change='dirtyVersion')
+        self.logger.info(f"Worker {leases.owner} joining {group}")
+
+        results = []
+        poll_seconds = min(30, WORK_LEASE_SECONDS / 4)
+        leases.start_heartbeat()
         try:
-            self.connect_db()
-            customer_refs = self.fetch_customer_refs()
-            results = []
-            for ref in customer_refs:
+            while True:
+                item = leases.claim_next(group)
+                if item is None:
+                    # Complete our own buffered leases before checking on other workers
+                    self.prediction_writer.flush()
+                    if leases.remaining(group) == 0:
+                        break
+                    # Other workers still hold leases; wait in case one of them dies
+                    time.sleep(poll_seconds)
+                    continue
+                ref = item['key']
                 result = self.process_customer(ref, sequence_length, batch_size)
-                if result:
-                    results.append(result)
-            return results
+                if not result or result['status'] == 'insufficient_data':
+                    self.settle_dirty_flag(ref, item.get('dirtyVersion'), result)
+                    leases.complete(item['_id'], status='failed' if result is None else 'done')
+                    continue
+                results.append(result)
+                self.prediction_writer.after_flush(lambda item=item: self._finish_leased_item(leases, item))
+        finally:
+            self.prediction_writer.flush()
+            leases.stop_heartbeat()
+        self.logger.info(f"Worker {leases.owner} processed {len(results)} customers for {group}")
+        return results
+
+    def _finish_leased_item(self, leases: LeaseManager, item: Dict):
+        if item.get('dirtyVersion') is not None:
+            self.db_manager.clear_dirty_customer(item['key'], item['dirtyVersion'])
+        leases.complete(item['_id'])
+
+    def run(self, sequence_length: int = 192, batch_size: int = None, schedule: str = PREDICTION_SCHEDULE,
+            coordination: str = PREDICTION_COORDINATION) -> List[Dict]:
+        try:
+            self.connect_db()
+            queue, dirty_versions = self.build_work_queue(schedule)
+            if coordination == 'leases':
+                return self.run_leased(queue, dirty_versions, sequence_length, batch_size)
+            if coordination != 'local':
+                raise ValueError(f"Unknown prediction coordination mode: {coordination}")
+            return self.run_local(queue, dirty_versions, sequence_length, batch_size)
         except Exception as e:
             self.logger.error(f"Pipeline failed: {e}")
             raise
         finally:
+            self.plot_report = self.plot_renderer.close()
             self.close_db()
 
 if __name__ == "__main__":
     pipeline = CustomerBehaviorPipeline(logger=logger)
-    results = pipeline.run()
+    try:
+        results = pipeline.run()
+    finally:
+        pipeline.plot_renderer.shutdown()
     for res in results:
         logger.info(f"Customer {res['customer_ref']}: R²={res.get('r2_score', 'N/A'):.4f}, "
                     f"Plot: {res['plot_path']}")
\ No newline at end of file
@@ -0,0 +1,171 @@
+from imports import *
+
+from datetime import timezone
+from itertools import islice
+
+# Flat column name -> (source path in the measurement document, NumPy dtype).
+# The aggregation projects these server-side, so documents arrive flat and
+# no nested `phases` sub-documents are built on the client.
+MEASUREMENT_COLUMNS = {
+    'timestamp': ('timestamp', 'datetime64[ms]'),
+    'serial': ('metadata.serial', np.int64),
+    'avg_import_kw': ('avg_import_kw', np.float64),
+    'import_kwh': ('import_kwh', np.float64),
+    'power_factor': ('power_factor', np.float64),
+    'phase_a_current': ('phases.A.instCurrent', np.float64),
+    'phase_a_voltage': ('phases.A.instVoltage', np.float64),
+    'phase_b_current': ('phases.B.instCurrent', np.float64),
+    'phase_b_voltage': ('phases.B.instVoltage', np.float64),
+    'phase_c_current': ('phases.C.instCurrent', np.float64),
+    'phase_c_voltage': ('phases.C.instVoltage', np.float64),
+}
+
+MEASUREMENT_DECODERS = ('auto', 'arrow', 'raw', 'cursor')
+
+CURSOR_CHUNK_SIZE = 10000
+
+EPOCH = datetime(1970, 1, 1)
+
+def flat_projection() -> Dict:
+    projection = {'_id': 0}
+    for name, (path, _) in MEASUREMENT_COLUMNS.items():
+        projection[name] = 1 if name == path else f"${path}"
+    return projection
+
+class ColumnBuffer:
+    """Growable, preallocated typed arrays, one per measurement column.
+
+    Capacity doubles when a batch does not fit, so a fetch costs O(log n)
+    reallocations and holds one copy of each column plus the current batch.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.size = 0
+        self.capacity = capacity
+        self.columns = {}
+        for name, (_, dtype) in MEASUREMENT_COLUMNS.items():
+            if name == 'timestamp':
+                # Filled with epoch milliseconds and viewed as datetime64 at the end
+                self.columns[name] = np.empty(capacity, dtype=np.int64)
+            else:
+                self.columns[name] = np.empty(capacity, dtype=dtype)
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= self.capacity:
+            return
+        while self.capacity < needed:
+            self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def extend(self, docs: List[Dict]):
+        """Append a batch of flat documents."""
+        n = len(docs)
+        if n == 0:
+            return
+        self._reserve(n)
+        end = self.size + n
+        for name, column in self.columns.items():
+            if name == 'timestamp':
+                column[self.size:end] = np.fromiter((_epoch_ms(doc['timestamp']) for doc in docs),
+                                                    dtype=np.int64, count=n)
+            elif name == 'serial':
+                column[self.size:end] = np.fromiter((doc['serial'] for doc in docs), dtype=np.int64, count=n)
+            else:
+                # NumPy turns missing (None) readings into NaN
+                column[self.size:end] = np.array([doc.get(name) for doc in docs], dtype=np.float64)
+        self.size = end
+
+    def to_frame(self) -> "pd.DataFrame":
+        data = {}
+        for name, column in self.columns.items():
+            column = column[:self.size]
+            data[name] = column.view('datetime64[ms]') if name == 'timestamp' else column
+        return pd.DataFrame(data)
+
+def _epoch_ms(value) -> int:
+    # DatetimeMS supports int(); plain datetimes come from mongomock or old drivers
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - EPOCH) // timedelta(milliseconds=1)
+    return int(value)
+
+def _raw_codec_options():
+    from bson.codec_options import CodecOptions
+    try:
+        from bson.codec_options import DatetimeConversion
+    except ImportError:
+        # pymongo < 4.3 always decodes to datetime objects
+        return CodecOptions()
+    return CodecOptions(datetime_conversion=DatetimeConversion.DATETIME_MS)
+
+def _read_raw(collection, pipeline: List[Dict]) -> "pd.DataFrame":
+    import bson
+
+    codec_options = _raw_codec_options()
+    buffer = ColumnBuffer()
+    for batch in collection.aggregate_raw_batches(pipeline, allowDiskUse=True):
+        # Decode one server batch at a time; its dicts are released before the next
+        buffer.extend(bson.decode_all(batch, codec_options))
+    return buffer.to_frame()
+
+def _read_cursor(collection, pipeline: List[Dict]) -> "pd.DataFrame":
+    cursor = collection.aggregate(pipeline, allowDiskUse=True)
+    buffer = ColumnBuffer()
+    while True:
+        docs = list(islice(cursor, CURSOR_CHUNK_SIZE))
+        if not docs:
+            break
+        buffer.extend(docs)
+    return buffer.to_frame()
+
+def _read_arrow(collection, pipeline: List[Dict]) -> "pd.DataFrame":
+    from pymongoarrow.api import Schema, aggregate_numpy_all
+
+    schema = Schema({name: datetime if name == 'timestamp' else int if name == 'serial' else float
+                     for name in MEASUREMENT_COLUMNS})
+    arrays = aggregate_numpy_all(collection, pipeline, schema=schema, allowDiskUse=True)
+    data = {}
+    for name, (_, dtype) in MEASUREMENT_COLUMNS.items():
+        data[name] = np.asarray(arrays[name], dtype=dtype)
+    return pd.DataFrame(data)
+
+def _arrow_available() -> bool:
+    try:
+        import pymongoarrow.api  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def resolve_decoder(collection, decoder: str = 'auto') -> str:
+    if decoder not in MEASUREMENT_DECODERS:
+        raise ValueError(f"Unknown measurement decoder: {decoder}. Expected one of {list(MEASUREMENT_DECODERS)}")
+    from pymongo.collection import Collection
+
+    # mongomock and other stand-ins only offer the plain cursor API
+    is_pymongo = isinstance(collection, Collection)
+    if decoder == 'auto':
+        if is_pymongo and _arrow_available():
+            return 'arrow'
+        return 'raw' if is_pymongo else 'cursor'
+    if decoder in ('arrow', 'raw') and not is_pymongo:
+        raise ValueError(f"Decoder '{decoder}' needs a pymongo collection")
+    return decoder
+
+def read_measurements(collection, pipeline: List[Dict], decoder: str = 'auto') -> "pd.DataFrame":
+    """Run a measurement aggregation ending in flat_projection() into a columnar DataFrame.
+
+    'arrow' decodes BSON in C via pymongoarrow (optional dependency), 'raw'
+    decodes raw cursor batches one at a time, 'cursor' chunks a regular
+    cursor. All three fill typed arrays instead of holding every document.
+    """
+    decoder = resolve_decoder(collection, decoder)
+    if decoder == 'arrow':
+        return _read_arrow(collection, pipeline)
+    if decoder == 'raw':
+        return _read_raw(collection, pipeline)
+    return _read_cursor(collection, pipeline)
@@ -1,5 +1,8 @@
 from imports import *
 
+import torch
+import torch.nn as nn
+
 class BiLSTM(nn.Module):
     def __init__(self, input_size: int, hidden_size: int = 64, num_layers: int = 2, 
                  dropout: float = 0.2, output_size: int = 96):
@@ -1,54 +1,234 @@
 from imports import *
 
-def train_model(model, train_loader: DataLoader, val_loader: DataLoader, logger: logging.Logger, num_epochs: int = 10, patience: int = 3):
+import copy
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+from data_processing import window_sampler, bound_validation
+
+# Training profiles. 'default' reproduces the original eager FP32 setup;
+# 'fast' trades a little numerical precision for throughput (bf16 autocast,
+# torch.compile, bigger batches with a sqrt-scaled Adam learning rate and
+# persistent DataLoader workers).
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 0.001
+
+TRAINING_PROFILES = {
+    'default': {
+        'batch_size': BASE_BATCH_SIZE,
+        'autocast_bf16': False,
+        'compile': False,
+        'num_workers': 0,
+        'num_threads': None,
+    },
+    'fast': {
+        'batch_size': 256,
+        'autocast_bf16': True,
+        'compile': True,
+        'num_workers': 2,
+        'num_threads': os.cpu_count(),
+    },
+}
+
+def get_training_profile(name: str) -> Dict:
+    if name not in TRAINING_PROFILES:
+        raise ValueError(f"Unknown training profile: {name}. Expected one of {list(TRAINING_PROFILES)}")
+    profile = dict(TRAINING_PROFILES[name])
+    profile['name'] = name
+    profile['learning_rate'] = BASE_LEARNING_RATE * (profile['batch_size'] / BASE_BATCH_SIZE) ** 0.5
+    return profile
+
+def build_data_loaders(train_dataset: Dataset, val_dataset: Dataset, profile: Dict,
+                       batch_size: int = None, sampling: Dict = None) -> tuple[DataLoader, DataLoader]:
+    batch_size = batch_size or profile['batch_size']
+    sampling = sampling or {'strategy': 'all'}
+    num_workers = profile['num_workers']
+    loader_kwargs = {'batch_size': batch_size, 'num_workers': num_workers}
+    if num_workers > 0:
+        loader_kwargs['persistent_workers'] = True
+        loader_kwargs['prefetch_factor'] = 4
+    train_loader = DataLoader(train_dataset, sampler=window_sampler(train_dataset, sampling), **loader_kwargs)
+    val_loader = DataLoader(bound_validation(val_dataset, sampling), **loader_kwargs)
+    return train_loader, val_loader
+
+# Compiled modules shared by every train_model call in the process, keyed by
+# architecture and device. Dynamo guards on the module object, so compiling a
+# fresh wrapper per customer would pay the full compile cost every time;
+# instead each customer's weights are copied into the cached module.
+_COMPILED_MODULES = {}
+
+class _CompiledForward:
+    """Forward through the cached compiled module, with an eager fallback.
+
+    torch.compile is lazy: the forward graph is compiled on the first call and
+    the backward graph on the first backward pass (and again on recompiles,
+    e.g. for eval mode), so compilation errors only surface there. ``run``
+    executes a whole step and, on the first step per grad mode, retries it in
+    eager mode if compilation fails. The fallback sticks for the cached module.
+    """
+
+    def __init__(self, entry: Dict, logger: logging.Logger):
+        self.entry = entry
+        self.logger = logger
+        self.compile_s = 0.0
+
+    def __call__(self, x):
+        if self.entry['failed']:
+            return self.entry['module'](x)
+        return self.entry['forward'](x)
+
+    def run(self, step):
+        mode = torch.is_grad_enabled()
+        if self.entry['failed'] or mode in self.entry['warm']:
+            return step()
+        start = time.perf_counter()
+        try:
+            result = step()
+        except Exception as e:
+            self.logger.warning(f"torch.compile failed, falling back to eager mode: {e}")
+            self.entry['failed'] = True
+            return step()
+        # The first step per mode is dominated by compilation
+        self.compile_s += time.perf_counter() - start
+        self.entry['warm'].add(mode)
+        return result
+
+def _compiled_entry(model, device: torch.device, logger: logging.Logger) -> Dict:
+    if isinstance(model, torch.jit.ScriptModule):
+        # Retrained stored models are TorchScript, which torch.compile does not support
+        return None
+    key = (type(model).__qualname__, device.type,
+           tuple((name, tuple(t.shape)) for name, t in model.state_dict().items()))
+    entry = _COMPILED_MODULES.get(key)
+    if entry is None:
+        module = copy.deepcopy(model).to(device)
+        try:
+            forward = torch.compile(module)
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable, falling back to eager mode: {e}")
+            return None
+        entry = {'module': module, 'forward': forward, 'warm': set(), 'failed': False}
+        _COMPILED_MODULES[key] = entry
+    return entry
+
+def _autocast_enabled(profile: Dict, device: torch.device) -> bool:
+    if not profile['autocast_bf16']:
+        return False
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    return True
+
+def train_model(model, train_loader: DataLoader, val_loader: DataLoader, logger: logging.Logger, num_epochs: int = 10,
+                patience: int = 3, profile: Dict = None, stats: Dict = None):
+    """Train ``model`` in place and return (model, best_val_loss, r2).
+
+    If ``stats`` is given it receives ``epoch_times`` and ``compile_s``, the time
+    of the first (compiling) steps, which is also included in the epoch times.
+    """
+    profile = profile or get_training_profile('default')
+    # The thread count is process-wide; restore it so later models (or other
+    # profiles in the same process) do not inherit this profile's setting
+    previous_threads = torch.get_num_threads()
+    if profile['num_threads']:
+        torch.set_num_threads(profile['num_threads'])
+    try:
+        return _train_model(model, train_loader, val_loader, logger, num_epochs, patience, profile, stats)
+    finally:
+        torch.set_num_threads(previous_threads)
+
+def _train_model(model, train_loader: DataLoader, val_loader: DataLoader, logger: logging.Logger, num_epochs: int,
+                 patience: int, profile: Dict, stats: Dict):
     criterion = nn.MSELoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model.to(device)
 
+    use_autocast = _autocast_enabled(profile, device)
+
+    # With compile, training runs on the cached compiled module and the final
+    # weights are copied back, so checkpoints and TorchScript export keep
+    # working on the caller's plain module.
+    trained = model
+    forward = model
+    run_step = lambda step: step()
+    entry = _compiled_entry(model, device, logger) if profile['compile'] and hasattr(torch, 'compile') else None
+    if entry is not None:
+        trained = entry['module']
+        trained.load_state_dict(model.state_dict())
+        forward = _CompiledForward(entry, logger)
+        run_step = forward.run
+    optimizer = torch.optim.Adam(trained.parameters(), lr=profile['learning_rate'])
+
     best_val_loss = float('inf')
     best_model_state = None
     epochs_no_improve = 0
     early_stop = False
+    r2 = float('nan')
+    epoch_times = []
 
     for epoch in range(num_epochs):
         if early_stop:
             break
-        model.train()
-        train_loss = 0
+        epoch_start = time.perf_counter()
+        trained.train()
+        train_loss = torch.zeros((), dtype=torch.float64, device=device)
+        train_count = 0
         for batch_x, batch_y in train_loader:
             batch_x, batch_y = batch_x.to(device), batch_y.to(device)
-            optimizer.zero_grad()
-            outputs = model(batch_x)
-            loss = criterion(outputs.squeeze(), batch_y.squeeze())
-            loss.backward()
+
+            def train_step():
+                optimizer.zero_grad()
+                with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_autocast):
+                    outputs = forward(batch_x)
+                loss = criterion(outputs.float().squeeze(), batch_y.squeeze())
+                loss.backward()
+                return loss
+
+            loss = run_step(train_step)
             optimizer.step()
-            train_loss += loss.item() * batch_x.size(0)
+            train_loss += loss.detach() * batch_x.size(0)
+            train_count += batch_x.size(0)
 
-        # Validation loop
-        model.eval()
-        val_loss = 0
-        predictions, actuals = [], []
+        # Validation loop: accumulate loss and R² sums on-device, one sync per epoch
+        trained.eval()
+        val_loss = torch.zeros((), dtype=torch.float64, device=device)
+        sum_y = torch.zeros((), dtype=torch.float64, device=device)
+        sum_y2 = torch.zeros((), dtype=torch.float64, device=device)
+        sum_res2 = torch.zeros((), dtype=torch.float64, device=device)
+        count = 0
+        val_count = 0
         with torch.no_grad():
             for batch_x, batch_y in val_loader:
                 batch_x, batch_y = batch_x.to(device), batch_y.to(device)
-                outputs = model(batch_x)
-                val_loss += criterion(outputs.squeeze(), batch_y.squeeze()).item() * batch_x.size(0)
-                predictions.extend(outputs.cpu().numpy())
-                actuals.extend(batch_y.cpu().numpy())
-
-        # Post-epoch processing
-        val_loss /= len(val_loader.dataset)
-        train_loss /= len(train_loader.dataset)
-        predictions = np.concatenate(predictions)
-        actuals = np.concatenate(actuals)
-        r2 = r2_score(actuals.flatten(), predictions.flatten())
-        logger.info(f'Epoch {epoch+1}/{num_epochs}, Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f}, R² Score: {r2:.4f}')
-        
+
+                def eval_step():
+                    with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_autocast):
+                        return forward(batch_x)
+
+                outputs = run_step(eval_step).float()
+                val_loss += criterion(outputs.squeeze(), batch_y.squeeze()).double() * batch_x.size(0)
+                y = batch_y.double().flatten()
+                sum_y += y.sum()
+                sum_y2 += (y * y).sum()
+                sum_res2 += ((y - outputs.double().flatten()) ** 2).sum()
+                count += y.numel()
+                val_count += batch_x.size(0)
+
+        # Post-epoch processing; samplers may visit only part of the datasets
+        val_loss = val_loss.item() / max(val_count, 1)
+        train_loss = train_loss.item() / max(train_count, 1)
+        ss_tot = (sum_y2 - sum_y * sum_y / max(count, 1)).item()
+        r2 = 1.0 - sum_res2.item() / ss_tot if ss_tot > 0 else float('nan')
+        epoch_time = time.perf_counter() - epoch_start
+        epoch_times.append(epoch_time)
+        logger.info(f'Epoch {epoch+1}/{num_epochs}, Train Loss: {train_loss:.4f}, Val Loss: {val_loss:.4f}, '
+                    f'R² Score: {r2:.4f}, Time: {epoch_time:.2f}s [{profile["name"]}]')
+
         # Early stopping
         if val_loss < best_val_loss:
             best_val_loss = val_loss
-            best_model_state = model.state_dict()
+            best_model_state = {k: v.detach().clone() for k, v in trained.state_dict().items()}
             epochs_no_improve = 0
         else:
             epochs_no_improve += 1
@@ -56,6 +236,16 @@ def train_model(model, train_loader: DataLoader, val_loader: DataLoader, logger:
                 early_stop = True
                 logger.info(f"No improvement in validation loss for {patience} epochs")
 
+    compile_s = forward.compile_s if isinstance(forward, _CompiledForward) else 0.0
+    if epoch_times:
+        logger.info(f"Training finished with profile '{profile['name']}': {len(epoch_times)} epochs, "
+                    f"mean epoch time {sum(epoch_times) / len(epoch_times):.2f}s, compile {compile_s:.2f}s, "
+                    f"best val loss {best_val_loss:.4f}, R² {r2:.4f}")
+    if stats is not None:
+        stats['epoch_times'] = epoch_times
+        stats['compile_s'] = compile_s
     if best_model_state:
         model.load_state_dict(best_model_state)
-    return model, best_val_loss, r2
\ No newline at end of file
+    elif trained is not model:
+        model.load_state_dict(trained.state_dict())
+    return model, best_val_loss, r2
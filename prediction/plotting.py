@@ -0,0 +1,188 @@
+from imports import *
+
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from prediction_writer import load_prediction
+
+PLOT_MODES = ('sync', 'deferred', 'lazy', 'off')
+
+def prediction_times(last_time, periods: int = 96) -> "pd.DatetimeIndex":
+    return pd.date_range(start=pd.Timestamp(last_time) + pd.Timedelta(minutes=15), periods=periods, freq='15min')
+
+def plot_path_for(output_base_dir: str, customer_ref: int) -> str:
+    output_dir = os.path.join(output_base_dir, f"customer_{customer_ref}")
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"pred_{customer_ref}_{int(datetime.now().timestamp())}.png")
+
+def render_prediction_plot(hist_times: np.ndarray, hist_kwh: np.ndarray, predictions: np.ndarray,
+                           customer_ref: int, plot_path: str) -> float:
+    """Render one prediction plot to ``plot_path`` and return the render time in seconds.
+
+    Uses the object-oriented Figure API with the Agg canvas, so it needs no
+    pyplot state and is safe to run in worker processes.
+    """
+    from matplotlib.figure import Figure
+
+    start = time.perf_counter()
+    fig = Figure(figsize=(16, 6))
+    ax = fig.subplots()
+    ax.plot(hist_times, hist_kwh, label='Historical', color='blue')
+    last_time = hist_times[-1]
+    ax.plot(prediction_times(last_time, len(predictions)), predictions, '--', marker='o', color='green',
+            label='Prediction (Next 24h)')
+    ax.axvline(last_time, color='red', linestyle='--', label='Prediction Start')
+    ax.set_title(f"Customer {customer_ref} - 24-Hour Energy Prediction")
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Cumulative kWh")
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(plot_path)
+    return time.perf_counter() - start
+
+def _init_render_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+def start_render_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool for deferred plots, with every worker started before this returns.
+
+    Spawned (and forkserver) workers re-import the launching script, i.e. all of
+    main.py with torch and a new log file, so workers are forked where the
+    platform allows. Call this before any MongoDB client or background thread
+    exists, so the children do not inherit locks held by other threads.
+    """
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method),
+                                   initializer=_init_render_worker)
+    # Forking pools start all their workers on the first submit
+    executor.submit(int).result()
+    return executor
+
+def create_prediction_plot(df: "pd.DataFrame", predictions: np.ndarray, customer_ref: int, sequence_length: int,
+                           output_base_dir: str, logger: logging.Logger) -> str:
+    try:
+        last_data = df.tail(sequence_length)
+        plot_path = plot_path_for(output_base_dir, customer_ref)
+        render_prediction_plot(last_data['timestamp'].to_numpy(), last_data['import_kwh'].to_numpy(),
+                               predictions, customer_ref, plot_path)
+        logger.info(f"Saved plot: {plot_path}")
+        return plot_path
+    except Exception as e:
+        logger.error(f"Plotting failed for customer {customer_ref}: {e}")
+        raise
+
+class PlotRenderer:
+    """Renders prediction plots according to the configured mode.
+
+    - ``sync``: render inline, as the pipeline always did.
+    - ``deferred``: hand the (small) plot inputs to a background process pool.
+    - ``lazy``: render nothing during the run; use ``render_stored_prediction``
+      to draw a customer's plot on demand from the stored predictions.
+    - ``off``: no plots.
+    """
+
+    def __init__(self, mode: str, output_base_dir: str, logger: logging.Logger, max_workers: int = 2):
+        if mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode: {mode}. Expected one of {PLOT_MODES}")
+        self.mode = mode
+        self.output_base_dir = output_base_dir
+        self.logger = logger
+        self.max_workers = max_workers
+        # Started up front, while the pipeline is still single-threaded, and kept until shutdown()
+        self.executor = start_render_pool(max_workers) if mode == 'deferred' else None
+        self.futures = []
+        self.submit_time = 0.0
+
+    def submit(self, df: "pd.DataFrame", predictions: np.ndarray, customer_ref: int, sequence_length: int) -> str:
+        """Schedule (or render) the plot for one customer and return its path, if any."""
+        if self.mode in ('off', 'lazy'):
+            return None
+        if self.mode == 'sync':
+            return create_prediction_plot(df, predictions, customer_ref, sequence_length,
+                                          self.output_base_dir, self.logger)
+        start = time.perf_counter()
+        try:
+            if self.executor is None:
+                raise RuntimeError("Plot renderer was shut down")
+            last_data = df.tail(sequence_length)
+            plot_path = plot_path_for(self.output_base_dir, customer_ref)
+            future = self.executor.submit(render_prediction_plot, last_data['timestamp'].to_numpy(),
+                                          last_data['import_kwh'].to_numpy(), np.asarray(predictions),
+                                          customer_ref, plot_path)
+            self.futures.append((customer_ref, plot_path, future))
+            return plot_path
+        except Exception as e:
+            self.logger.error(f"Failed to schedule plot for customer {customer_ref}: {e}")
+            raise
+        finally:
+            self.submit_time += time.perf_counter() - start
+
+    def close(self) -> Dict:
+        """Wait for deferred plots and report how much rendering was moved off the critical path."""
+        render_time, rendered, failed = 0.0, 0, 0
+        for customer_ref, plot_path, future in self.futures:
+            try:
+                render_time += future.result()
+                rendered += 1
+            except Exception as e:
+                failed += 1
+                self.logger.error(f"Deferred plot failed for customer {customer_ref}: {e}")
+        report = {'mode': self.mode, 'rendered': rendered, 'failed': failed,
+                  'render_time_s': render_time, 'submit_time_s': self.submit_time}
+        if self.futures:
+            self.logger.info(f"Rendered {rendered} plots in the background ({failed} failed): "
+                             f"{render_time:.2f}s of rendering kept off the critical path, "
+                             f"{self.submit_time:.2f}s spent scheduling")
+        self.futures = []
+        self.submit_time = 0.0
+        return report
+
+    def shutdown(self):
+        """Stop the deferred-plot workers; call close() first to collect pending plots."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+def render_stored_prediction(db_manager, customer_ref: int, sequence_length: int, output_base_dir: str,
+                             logger: logging.Logger, layout: str = 'rows') -> str:
+    """Lazy mode: draw a customer's latest stored prediction against the history it was made from."""
+    try:
+        pred_times, predictions = load_prediction(db_manager.db, customer_ref, layout)
+        if len(predictions) == 0:
+            logger.warning(f"No stored prediction for customer {customer_ref}")
+            return None
+        df = db_manager.fetch_data(customer_ref)
+        history = df[df['timestamp'] < pred_times[0]].tail(sequence_length)
+        plot_path = plot_path_for(output_base_dir, customer_ref)
+        render_prediction_plot(history['timestamp'].to_numpy(), history['import_kwh'].to_numpy(),
+                               predictions, customer_ref, plot_path)
+        logger.info(f"Saved plot: {plot_path}")
+        return plot_path
+    except Exception as e:
+        logger.error(f"Plotting failed for customer {customer_ref}: {e}")
+        raise
+
+if __name__ == "__main__":
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from config import DB_CONFIG, OUTPUT_BASE_DIR, PREDICTION_LAYOUT
+    from database_utils import DatabaseManager
+    from logger import setup_logger
+
+    parser = argparse.ArgumentParser(description="Render prediction plots on demand from stored predictions")
+    parser.add_argument('customer_refs', nargs='+', type=int)
+    parser.add_argument('--sequence-length', type=int, default=192)
+    parser.add_argument('--output-dir', default=f"{OUTPUT_BASE_DIR}_plots")
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    db_manager = DatabaseManager(db_config=DB_CONFIG, logger=logger)
+    db_manager.connect()
+    try:
+        for ref in args.customer_refs:
+            render_stored_prediction(db_manager, ref, args.sequence_length, args.output_dir, logger, PREDICTION_LAYOUT)
+    finally:
+        db_manager.close()
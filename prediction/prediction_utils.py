@@ -2,50 +2,13 @@ from imports import *
 
 def predict_next_timestep(model: "nn.Module", last_sequence: np.ndarray,
                           scaler: "StandardScaler", last_kwh: float, logger: logging.Logger) -> tuple[np.ndarray, np.ndarray]:
-    try:
-        model.eval()
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        x = torch.FloatTensor(last_sequence).unsqueeze(0).to(device)
-        with torch.no_grad():
-            pred = model(x).cpu().numpy().squeeze()
-        dummy = np.zeros((96, len(scaler.mean_)))
-        dummy[:, 0] = pred
-        pred_kwh_delta = scaler.inverse_transform(dummy)[:, 0]
-        pred_kwh_delta = np.maximum(pred_kwh_delta, 0)
-        pred_kwh = [last_kwh + pred_kwh_delta[0]]
-        for i in range(1, 96):
-            pred_kwh.append(pred_kwh[-1] + pred_kwh_delta[i])
-        return np.array(pred_kwh), pred_kwh_delta
-    except Exception as e:
-        logger.error(f"Prediction failed: {e}")
-        raise
+    # Imported here so writing predictions does not pull in torch
+    from inference import forecast
 
-def create_prediction_plot(df: pd.DataFrame, predictions: np.ndarray, customer_ref: int, sequence_length: int,
-                           output_base_dir: str, logger: logging.Logger) -> str:
     try:
-        output_dir = os.path.join(output_base_dir, f"customer_{customer_ref}")
-        os.makedirs(output_dir, exist_ok=True)
-        plt.figure(figsize=(16, 6))
-        last_data = df.tail(sequence_length)
-        plt.plot(last_data['timestamp'], last_data['import_kwh'], label='Historical', color='blue')
-        last_time = last_data['timestamp'].iloc[-1]
-        pred_times = [last_time + timedelta(minutes=15 * (i + 1)) for i in range(96)]
-        plt.plot(pred_times, predictions, '--', marker='o', color='green', label='Prediction (Next 24h)')
-        plt.axvline(last_time, color='red', linestyle='--', label='Prediction Start')
-        plt.title(f"Customer {customer_ref} - 24-Hour Energy Prediction")
-        plt.xlabel("Time")
-        plt.ylabel("Cumulative kWh")
-        plt.legend()
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plot_path = os.path.join(output_dir, f"pred_{customer_ref}_{int(datetime.now().timestamp())}.png")
-        plt.savefig(plot_path)
-        plt.close()
-        logger.info(f"Saved plot: {plot_path}")
-        return plot_path
+        return forecast(model, last_sequence, scaler.mean_[0], scaler.scale_[0], last_kwh)
     except Exception as e:
-        logger.error(f"Plotting failed for customer {customer_ref}: {e}")
+        logger.error(f"Prediction failed: {e}")
         raise
 
 def save_prediction_to_db(db, customer_ref: int, pred_abs: np.ndarray,
@@ -68,7 +31,7 @@ def save_prediction_to_db(db, customer_ref: int, pred_abs: np.ndarray,
         logger.error(f"Failed to save predictions for customer {customer_ref}: {e}")
         raise
 
-def save_model_to_db(db, model: "nn.Module", customer_ref: int,
+def save_model_to_db(db, model: "nn.Module", customer_ref: int, scaler: "StandardScaler",
                      mse: float, r2_score: float, trained_data_timestamp: datetime, logger: logging.Logger):
     try:
         buffer = io.BytesIO()
@@ -78,6 +41,9 @@ def save_model_to_db(db, model: "nn.Module", customer_ref: int,
             {"customer_ref": customer_ref},
             {"$set": {
                 "model_data": model_data,
+                # Lets inference without new data scale its window without refitting
+                "scaler_mean": scaler.mean_.tolist(),
+                "scaler_scale": scaler.scale_.tolist(),
                 "mse": float(mse),
                 "r2_score": float(r2_score),
                 "last_trained_data_timestamp": trained_data_timestamp,
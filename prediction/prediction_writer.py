@@ -0,0 +1,125 @@
+from imports import *
+
+from pymongo import DeleteMany, ReplaceOne
+
+PREDICTION_LAYOUTS = ('rows', 'compact')
+
+class PredictionWriter:
+    """Buffers predictions from many customers and persists them in bulk.
+
+    Layouts:
+    - ``rows``: the original customer_prediction layout, one document per
+      15-minute interval, written with ``ReplaceOne`` upserts on
+      (customer_ref, prediction_timestamp). Only rows of the previous forecast
+      that fall outside the new one are deleted, so rerunning a customer
+      rewrites its rows in place instead of deleting and reinserting all 96.
+    - ``compact``: one document per customer in customer_forecast holding the
+      96-element arrays, written with ``ReplaceOne`` upserts on customer_ref.
+
+    Both layouts flush with one unordered ``bulk_write`` and rely on the
+    unique indexes created by ``ensure_indexes`` (and create.js).
+
+    Callbacks registered with ``after_flush`` run once everything buffered so
+    far is durable, so callers can defer acknowledgements (dirty flags, leases)
+    until then.
+    """
+
+    def __init__(self, db, logger: logging.Logger, layout: str = 'rows', flush_size: int = 100):
+        if layout not in PREDICTION_LAYOUTS:
+            raise ValueError(f"Unknown prediction layout: {layout}. Expected one of {PREDICTION_LAYOUTS}")
+        self.db = db
+        self.logger = logger
+        self.layout = layout
+        self.flush_size = flush_size
+        self.buffer = []
+        self.callbacks = []
+
+    @property
+    def collection(self):
+        return self.db.customer_forecast if self.layout == 'compact' else self.db.customer_prediction
+
+    def ensure_indexes(self):
+        if self.layout == 'compact':
+            self.db.customer_forecast.create_index([("customer_ref", 1)], unique=True)
+        else:
+            self.db.customer_prediction.create_index([("customer_ref", 1), ("prediction_timestamp", -1)], unique=True)
+
+    def add(self, customer_ref: int, pred_abs: np.ndarray, pred_delta: np.ndarray, start_time: datetime):
+        self.buffer.append((customer_ref, np.asarray(pred_abs, dtype=float), np.asarray(pred_delta, dtype=float),
+                            start_time, datetime.now()))
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def after_flush(self, callback):
+        if self.buffer:
+            self.callbacks.append(callback)
+        else:
+            callback()
+
+    def _operations(self) -> List:
+        operations = []
+        for customer_ref, pred_abs, pred_delta, start_time, generated_at in self.buffer:
+            if self.layout == 'compact':
+                operations.append(ReplaceOne(
+                    {"customer_ref": customer_ref},
+                    {
+                        "customer_ref": customer_ref,
+                        "start_time": start_time,
+                        "interval_minutes": 15,
+                        "predicted_usage": pred_delta.tolist(),
+                        "predicted_import_kwh": pred_abs.tolist(),
+                        "generated_at": generated_at
+                    },
+                    upsert=True
+                ))
+            else:
+                times = [start_time + timedelta(minutes=15 * i) for i in range(len(pred_abs))]
+                operations.append(DeleteMany({"customer_ref": customer_ref, "prediction_timestamp": {"$nin": times}}))
+                operations.extend(
+                    ReplaceOne(
+                        {"customer_ref": customer_ref, "prediction_timestamp": times[i]},
+                        {
+                            "customer_ref": customer_ref,
+                            "prediction_timestamp": times[i],
+                            "predicted_usage": float(pred_delta[i]),
+                            "predicted_import_kwh": float(pred_abs[i]),
+                            "generated_at": generated_at
+                        },
+                        upsert=True
+                    ) for i in range(len(pred_abs))
+                )
+        return operations
+
+    def flush(self) -> int:
+        if not self.buffer:
+            return 0
+        customers = len(self.buffer)
+        try:
+            # Every operation targets different documents, so the server may apply them in any order
+            self.collection.bulk_write(self._operations(), ordered=False)
+            self.logger.info(f"Saved predictions for {customers} customers ({self.layout} layout)")
+        except Exception as e:
+            self.logger.error(f"Failed to save predictions for {customers} customers: {e}")
+            raise
+        self.buffer = []
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+        return customers
+
+def load_prediction(db, customer_ref: int, layout: str = 'rows') -> tuple[np.ndarray, np.ndarray]:
+    """Return (prediction timestamps, predicted cumulative kWh) for a customer in either layout."""
+    if layout == 'compact':
+        doc = db.customer_forecast.find_one({"customer_ref": customer_ref})
+        if not doc:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=float)
+        values = np.array(doc['predicted_import_kwh'], dtype=float)
+        start = np.datetime64(doc['start_time'], 'ns')
+        times = start + np.arange(len(values)) * np.timedelta64(doc.get('interval_minutes', 15), 'm')
+        return times, values
+    docs = list(db.customer_prediction.find({"customer_ref": customer_ref},
+                                            {"prediction_timestamp": 1, "predicted_import_kwh": 1})
+                .sort("prediction_timestamp", 1))
+    times = np.array([doc['prediction_timestamp'] for doc in docs], dtype='datetime64[ns]')
+    values = np.array([doc['predicted_import_kwh'] for doc in docs], dtype=float)
+    return times, values
@@ -0,0 +1,53 @@
+from imports import *
+
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+class StageTimer:
+    """Accumulates wall time (and optionally peak Python heap) per pipeline stage."""
+
+    def __init__(self, track_memory: bool = False, record_functions: bool = False):
+        self.track_memory = track_memory
+        # Label stages in torch.profiler traces as well
+        self.record_functions = record_functions
+        self.reset()
+
+    def reset(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.peak_memory = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            if self.record_functions:
+                import torch.profiler
+
+                with torch.profiler.record_function(name):
+                    yield
+            else:
+                yield
+        finally:
+            self.totals[name] += time.perf_counter() - start
+            self.counts[name] += 1
+            if self.track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peak_memory[name] = max(self.peak_memory[name], peak)
+
+    def summary(self) -> Dict[str, Dict]:
+        summary = {}
+        for name, total in self.totals.items():
+            summary[name] = {
+                'count': self.counts[name],
+                'total_s': total,
+                'mean_s': total / self.counts[name],
+            }
+            if self.track_memory:
+                summary[name]['peak_mem_mb'] = self.peak_memory[name] / 2 ** 20
+        return summary
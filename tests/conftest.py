@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('mongomock')
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# config.py parses DB_PORT at import time and the sample .env leaves it blank
+os.environ.setdefault('DB_PORT', '27017')
+
+from shared_mongo import SharedDatabase, SharedMongoManager
+
+# Workers are forked so they inherit the test module and the manager's authkey
+CONTEXT = multiprocessing.get_context('fork')
+
+@pytest.fixture
+def shared_db():
+    manager = SharedMongoManager(ctx=CONTEXT)
+    manager.start()
+    try:
+        yield SharedDatabase(manager.store())
+    finally:
+        manager.shutdown()
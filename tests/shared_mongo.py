@@ -0,0 +1,63 @@
+"""A mongomock database shared between processes, for multi-worker tests.
+
+A multiprocessing manager process owns a single mongomock client. Worker
+processes get proxies whose collection calls run in that process one at a
+time, which gives the per-operation atomicity the lease code relies on from
+a real mongod.
+"""
+import threading
+from multiprocessing.managers import BaseManager
+
+import mongomock
+
+class _Store:
+    def __init__(self):
+        self.client = mongomock.MongoClient()
+        self.lock = threading.Lock()
+
+    def call(self, database, collection, method, args, kwargs):
+        with self.lock:
+            result = getattr(self.client[database][collection], method)(*args, **kwargs)
+            # Cursors cannot cross the process boundary
+            if hasattr(result, '__next__'):
+                result = list(result)
+            return result
+
+_store = None
+
+def _get_store():
+    global _store
+    if _store is None:
+        _store = _Store()
+    return _store
+
+class SharedMongoManager(BaseManager):
+    pass
+
+SharedMongoManager.register('store', callable=_get_store)
+
+class SharedCollection:
+    def __init__(self, store, database, name):
+        self._store = store
+        self._database = database
+        self._name = name
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self._store.call(self._database, self._name, method, args, kwargs)
+
+class SharedDatabase:
+    """Picklable handle to the shared database; ``db[name]`` and ``db.name`` give collections."""
+
+    def __init__(self, store, name='test'):
+        self._store = store
+        self._name = name
+
+    def __getitem__(self, collection):
+        return SharedCollection(self._store, self._name, collection)
+
+    def __getattr__(self, collection):
+        if collection.startswith('_'):
+            raise AttributeError(collection)
+        return self[collection]
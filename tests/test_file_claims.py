@@ -0,0 +1,95 @@
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from conftest import CONTEXT, ROOT
+from leases import LeaseManager
+
+sys.path.insert(0, os.path.join(ROOT, 'data_load'))
+
+from database import Database
+from file_processor import FileProcessor
+
+FILES = [f"meters/readings-{i}.csv" for i in range(6)]
+ABANDONED = 'readings-3.csv'
+ROWS_PER_FILE = 4
+LEASE_SECONDS = 10
+
+COLUMNS = [
+    'CUSTOMER_REF', 'SERIAL', 'DATE', 'TIME', 'OBIS', 'AVG._IMPORT_KW (kW)', 'IMPORT_KWH (kWh)',
+    'AVG._EXPORT_KW (kW)', 'EXPORT_KWH (kWh)', 'AVG._IMPORT_KVA (kVA)', 'AVG._EXPORT_KVA (kVA)',
+    'IMPORT_KVARH (kvarh)', 'EXPORT_KVARH (kvarh)', 'POWER_FACTOR', 'AVG._CURRENT (V)',
+    'AVG._VOLTAGE (V)', 'PHASE_A_INST._CURRENT (A)', 'PHASE_A_INST._VOLTAGE (V)',
+    'INST._POWER_FACTOR', 'PHASE_B_INST._CURRENT (A)', 'PHASE_B_INST._VOLTAGE (V)',
+    'PHASE_C_INST._CURRENT (A)', 'PHASE_C_INST._VOLTAGE (V)'
+]
+
+def serial_for(s3_key):
+    return 1000 + FILES.index(s3_key)
+
+class FakeS3Client:
+    """Writes a small CSV per key and records every download in the shared database."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def download_file(self, s3_key, temp_dir):
+        self.db.downloads.insert_one({'s3Path': s3_key, 'pid': os.getpid()})
+        serial = serial_for(s3_key)
+        local_path = os.path.join(temp_dir, f"{os.getpid()}-{os.path.basename(s3_key)}")
+        with open(local_path, 'w') as f:
+            f.write(','.join(COLUMNS) + '\n')
+            for row in range(ROWS_PER_FILE):
+                values = [serial, serial, '2024-01-01', f"00:{row * 15:02d}:00", '1.8.0'] + [0.5] * (len(COLUMNS) - 5)
+                f.write(','.join(str(v) for v in values) + '\n')
+        return local_path
+
+def run_worker(db, owner, temp_dir):
+    """Keep passing over the listing, like repeated ingestion runs, until every file is processed."""
+    logger = logging.getLogger(owner)
+    database = Database({}, logger)
+    database.db = db
+    claims = LeaseManager(db.file_claims, logger, owner=owner, lease_seconds=LEASE_SECONDS)
+    processor = FileProcessor(database, FakeS3Client(db), temp_dir, logger, claims=claims)
+    deadline = time.monotonic() + 30
+    while not all(processor.is_file_processed(s3_key) for s3_key in FILES):
+        assert time.monotonic() < deadline
+        for s3_key in FILES:
+            processor.process_file(s3_key)
+        time.sleep(0.1)
+
+def test_workers_ingest_each_file_once_and_take_over_abandoned_claim(shared_db, tmp_path):
+    # A worker that died without a heartbeat left this claim behind
+    abandoned_expiry = datetime.now(timezone.utc) + timedelta(seconds=1)
+    shared_db.file_claims.insert_one({
+        '_id': ABANDONED, 'status': 'leased', 'owner': 'crashed', 'leaseExpiresAt': abandoned_expiry,
+        'claimedAt': abandoned_expiry - timedelta(seconds=LEASE_SECONDS), 'attempts': 1
+    })
+
+    workers = [CONTEXT.Process(target=run_worker, args=(shared_db, f'worker-{i}', str(tmp_path)))
+               for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    downloads = Counter(d['s3Path'] for d in shared_db.downloads.find({}))
+    assert downloads == Counter(FILES)
+
+    processed = Counter(doc['fileName'] for doc in shared_db.processed_files.find({}))
+    assert processed == Counter(os.path.basename(s3_key) for s3_key in FILES)
+
+    measurements = Counter(doc['metadata']['serial'] for doc in shared_db.measurements.find({}))
+    assert measurements == {serial_for(s3_key): ROWS_PER_FILE for s3_key in FILES}
+
+    claims = {claim['_id']: claim for claim in shared_db.file_claims.find({})}
+    assert all(claims[os.path.basename(s3_key)]['status'] == 'done' for s3_key in FILES)
+    taken_over = claims[ABANDONED]
+    assert taken_over['attempts'] == 2
+    assert taken_over['owner'] != 'crashed'
+    # Datetimes come back from the database as naive UTC
+    assert taken_over['claimedAt'] >= abandoned_expiry.replace(tzinfo=None)
@@ -0,0 +1,70 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from conftest import CONTEXT
+from leases import LeaseManager
+
+GROUP = 'prediction:test-run'
+KEYS = list(range(40))
+LEASE_SECONDS = 2
+
+def run_worker(db, owner, crash_event=None):
+    """Seed the run and work through it; with ``crash_event``, hang after the first claim."""
+    leases = LeaseManager(db.work_leases, logging.getLogger(owner), owner=owner, lease_seconds=LEASE_SECONDS)
+    leases.seed(GROUP, [(key, key, {}) for key in KEYS])
+    while True:
+        item = leases.claim_next(GROUP)
+        if item is None:
+            if leases.remaining(GROUP) == 0:
+                return
+            time.sleep(0.05)
+            continue
+        if crash_event is not None:
+            db.crashes.insert_one({'key': item['key'], 'owner': owner, 'leaseExpiresAt': item['leaseExpiresAt']})
+            crash_event.set()
+            time.sleep(3600)
+        time.sleep(0.01)
+        if leases.complete(item['_id']):
+            db.completions.insert_one({'key': item['key'], 'owner': owner, 'at': datetime.now(timezone.utc)})
+
+def test_workers_finish_every_item_once_and_reclaim_dead_lease(shared_db):
+    crash_event = CONTEXT.Event()
+    doomed = CONTEXT.Process(target=run_worker, args=(shared_db, 'doomed', crash_event))
+    workers = [CONTEXT.Process(target=run_worker, args=(shared_db, f'worker-{i}')) for i in range(4)]
+    doomed.start()
+    for worker in workers:
+        worker.start()
+
+    assert crash_event.wait(10)
+    doomed.kill()
+    doomed.join()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    items = shared_db.work_leases.find({'group': GROUP})
+    assert sorted(item['key'] for item in items) == KEYS
+    assert all(item['status'] == 'done' for item in items)
+
+    completions = shared_db.completions.find({})
+    assert Counter(c['key'] for c in completions) == Counter(KEYS)
+    assert all(c['owner'] != 'doomed' for c in completions)
+
+    # The dead worker's item was only taken over once its lease expired
+    crash = shared_db.crashes.find_one({})
+    crashed_item = next(item for item in items if item['key'] == crash['key'])
+    assert crashed_item['attempts'] == 2
+    assert crashed_item['owner'] != 'doomed'
+    assert crashed_item['claimedAt'] >= crash['leaseExpiresAt']
+
+def test_seed_resets_finished_items_whose_version_changed(shared_db):
+    leases = LeaseManager(shared_db.work_leases, logging.getLogger('seed'), owner='seed')
+    leases.seed(GROUP, [(1, 0, {'dirtyVersion': 1}), (2, 1, {'dirtyVersion': 1})], reset_on_change='dirtyVersion')
+    for _ in range(2):
+        leases.complete(leases.claim_next(GROUP)['_id'])
+
+    leases.seed(GROUP, [(1, 0, {'dirtyVersion': 1}), (2, 1, {'dirtyVersion': 2})], reset_on_change='dirtyVersion')
+    statuses = {item['key']: (item['status'], item['dirtyVersion']) for item in shared_db.work_leases.find({})}
+    assert statuses == {1: ('done', 1), 2: ('pending', 2)}
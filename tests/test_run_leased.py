@@ -0,0 +1,82 @@
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from conftest import CONTEXT, ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'prediction'))
+
+RUN_ID = 'test-run'
+CUSTOMERS = list(range(1, 13))
+LEASE_SECONDS = 2
+# With 0.5s per customer and a flush every 5, leases are held past their expiry
+# while waiting for the flush, so only heartbeats keep other workers off them
+PROCESS_SECONDS = 0.5
+FLUSH_SIZE = 5
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # Importing main opens a log file in the working directory
+    monkeypatch.chdir(tmp_path)
+    import main
+    monkeypatch.setattr(main, 'WORK_LEASE_SECONDS', LEASE_SECONDS)
+    return main
+
+def make_pipeline(main, db, output_dir):
+    from prediction_writer import PredictionWriter
+
+    logger = logging.getLogger(f"worker-{os.getpid()}")
+    pipeline = main.CustomerBehaviorPipeline(logger=logger, output_base_dir=output_dir, plot_mode='off')
+    pipeline.db_manager.db = db
+    pipeline.prediction_writer = PredictionWriter(db, logger, 'rows', FLUSH_SIZE)
+
+    def process_customer(customer_ref, sequence_length=192, batch_size=None):
+        db.process_log.insert_one({'customer_ref': customer_ref, 'pid': os.getpid()})
+        time.sleep(PROCESS_SECONDS)
+        pred_delta = np.full(96, 0.25)
+        pred_abs = 100.0 + np.cumsum(pred_delta)
+        pipeline.prediction_writer.add(customer_ref, pred_abs, pred_delta, datetime(2024, 6, 1))
+        return {'customer_ref': customer_ref, 'status': 'predicted', 'predictions': pred_abs, 'plot_path': None}
+
+    pipeline.process_customer = process_customer
+    return pipeline
+
+def run_worker(main, db, output_dir):
+    pipeline = make_pipeline(main, db, output_dir)
+    queue, dirty_versions = pipeline.build_work_queue('changed')
+    pipeline.run_leased(queue, dirty_versions, 192, None, run_id=RUN_ID)
+
+def test_two_workers_predict_each_dirty_customer_once(main, shared_db, tmp_path):
+    now = datetime.now()
+    shared_db.dirty_customers.insert_many([{'_id': ref, 'firstDirtyAt': now, 'version': 1} for ref in CUSTOMERS])
+
+    workers = [CONTEXT.Process(target=run_worker, args=(main, shared_db, str(tmp_path))) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    log = shared_db.process_log.find({})
+    assert Counter(entry['customer_ref'] for entry in log) == Counter(CUSTOMERS)
+    assert len({entry['pid'] for entry in log}) == 2
+
+    rows = Counter(row['customer_ref'] for row in shared_db.customer_prediction.find({}))
+    assert rows == {ref: 96 for ref in CUSTOMERS}
+
+    leases = shared_db.work_leases.find({'group': f"prediction:{RUN_ID}"})
+    assert sorted(lease['key'] for lease in leases) == CUSTOMERS
+    assert all(lease['status'] == 'done' and lease['attempts'] == 1 for lease in leases)
+    assert shared_db.dirty_customers.count_documents({}) == 0
+
+def test_run_leased_requires_run_id(main, shared_db, tmp_path):
+    pipeline = make_pipeline(main, shared_db, str(tmp_path))
+    with pytest.raises(ValueError, match='PREDICTION_RUN_ID'):
+        pipeline.run_leased([(datetime.now(), 1)], {1: 1}, 192, None, run_id='')
+    assert shared_db.work_leases.count_documents({}) == 0